@@ -0,0 +1,152 @@
+"""Vectorized cohort analytics over the progress collection."""
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pymongoarrow.api import Schema, find_arrow_all
+
+PROGRESS_FIELDS = ("userId", "topic", "isCorrect", "timeSpent", "timestamp")
+PROGRESS_SCHEMA = Schema({
+    "userId": pa.string(),
+    "topic": pa.string(),
+    "isCorrect": pa.bool_(),
+    "timeSpent": pa.float64(),
+    "timestamp": pa.timestamp("ms"),
+})
+TIME_PERCENTILES = (50, 75, 90, 95, 99)
+ACCURACY_BINS = np.linspace(0, 100, 11)
+PASS_THRESHOLD = 0.5  # share of correct answers needed in the exam
+EXAM_QUESTIONS = 50
+RETENTION_DAYS = 30
+
+
+def load_progress_frame(collection, match: Optional[Dict] = None, batch_size: int = 10_000) -> pd.DataFrame:
+    """Decode ``progress`` straight into Arrow columns.
+
+    pymongoarrow projects the schema fields on the server and decodes the
+    raw BSON batches column-wise in native code, without a Python object
+    per document; missing or mistyped values become nulls.
+    """
+    table = find_arrow_all(collection, match or {}, schema=PROGRESS_SCHEMA, allow_invalid=True,
+                           batch_size=batch_size)
+    frame = table.to_pandas(strings_to_categorical=True)
+    frame["isCorrect"] = frame["isCorrect"].fillna(False).astype(bool)
+    return frame
+
+
+def normal_cdf(x: np.ndarray) -> np.ndarray:
+    # Logistic approximation of the standard normal CDF (max error ~0.01), numpy has no erf
+    return 1.0 / (1.0 + np.exp(-1.702 * x))
+
+
+def topic_accuracy_distribution(frame: pd.DataFrame) -> Dict[str, Any]:
+    per_user_topic = frame.groupby(["topic", "userId"], observed=True)["isCorrect"].mean().mul(100)
+    result = {}
+    for topic, accuracies in per_user_topic.groupby(level="topic", observed=True):
+        values = accuracies.to_numpy()
+        histogram, _ = np.histogram(values, bins=ACCURACY_BINS)
+        result[str(topic)] = {
+            "users": int(values.size),
+            "mean": round(float(values.mean()), 2),
+            "median": round(float(np.median(values)), 2),
+            "histogram": histogram.tolist(),
+        }
+    return {"bins": ACCURACY_BINS.tolist(), "topics": result}
+
+
+def time_percentiles(frame: pd.DataFrame) -> Dict[str, Any]:
+    times = frame["timeSpent"].to_numpy()
+    times = times[~np.isnan(times)]
+    if times.size == 0:
+        return {"overall": {}, "topics": {}}
+    overall = np.percentile(times, TIME_PERCENTILES)
+    quantiles = [p / 100 for p in TIME_PERCENTILES]
+    per_topic = frame.groupby("topic", observed=True)["timeSpent"].quantile(quantiles).unstack()
+    return {
+        "overall": {f"p{p}": round(float(v), 2) for p, v in zip(TIME_PERCENTILES, overall)},
+        "topics": {
+            str(topic): {f"p{p}": round(float(v), 2) for p, v in zip(TIME_PERCENTILES, row)}
+            for topic, row in zip(per_topic.index, per_topic.to_numpy())
+        },
+    }
+
+
+def pass_probabilities(frame: pd.DataFrame, limit: int) -> Dict[str, Any]:
+    """P(pass) per user from a Beta(1, 1)-smoothed accuracy and a binomial exam model."""
+    per_user = frame.groupby("userId", observed=True)["isCorrect"].agg(["sum", "count"])
+    correct = per_user["sum"].to_numpy(dtype=float)
+    answered = per_user["count"].to_numpy(dtype=float)
+    p = (correct + 1) / (answered + 2)
+    # Normal approximation of Binomial(EXAM_QUESTIONS, p) >= threshold, with continuity correction
+    mean = EXAM_QUESTIONS * p
+    std = np.sqrt(EXAM_QUESTIONS * p * (1 - p))
+    needed = np.ceil(PASS_THRESHOLD * EXAM_QUESTIONS) - 0.5
+    probability = normal_cdf((mean - needed) / std)
+
+    order = np.argsort(probability)[:limit]
+    histogram, _ = np.histogram(probability, bins=np.linspace(0, 1, 11))
+    return {
+        "users": int(probability.size),
+        "meanProbability": round(float(probability.mean()), 4) if probability.size else 0.0,
+        "histogram": histogram.tolist(),
+        "atRisk": [
+            {"userId": str(per_user.index[i]), "passProbability": round(float(probability[i]), 4),
+             "answered": int(answered[i])}
+            for i in order
+        ],
+    }
+
+
+def retention_curve(frame: pd.DataFrame, days: int = RETENTION_DAYS) -> Dict[str, Any]:
+    """Share of users active again k days after their first answer."""
+    stamps = frame[["userId", "timestamp"]].dropna()
+    if stamps.empty:
+        return {"users": 0, "days": list(range(days + 1)), "retention": [0.0] * (days + 1)}
+    day = stamps["timestamp"].dt.floor("D")
+    first_day = day.groupby(stamps["userId"], observed=True).transform("min")
+    offsets = (day - first_day).dt.days.to_numpy()
+    user_codes = stamps["userId"].cat.codes.to_numpy()
+
+    in_range = offsets <= days
+    # Unique (user, offset) pairs encoded as one integer
+    pairs = np.unique(user_codes[in_range].astype(np.int64) * (days + 1) + offsets[in_range])
+    active = np.bincount(pairs % (days + 1), minlength=days + 1)
+    users = int(np.unique(user_codes).size)
+    return {"users": users, "days": list(range(days + 1)), "retention": np.round(active / users, 4).tolist()}
+
+
+def compute_cohort_analytics(frame: pd.DataFrame, limit: int = 100) -> Dict[str, Any]:
+    return {
+        "answers": int(len(frame)),
+        "topicAccuracy": topic_accuracy_distribution(frame),
+        "timeOnQuestion": time_percentiles(frame),
+        "passProbability": pass_probabilities(frame, limit),
+        "retention": retention_curve(frame),
+    }
+
+
+class AnalyticsCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entries: Dict[Any, Tuple[float, Dict[str, Any]]] = {}
+
+    def get(self, key) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def set(self, key, value: Dict[str, Any]):
+        self.entries[key] = (time.monotonic(), value)
+
+
+_cache: Optional[AnalyticsCache] = None
+
+
+def get_cache(ttl: float) -> AnalyticsCache:
+    global _cache
+    if _cache is None:
+        _cache = AnalyticsCache(ttl)
+    return _cache
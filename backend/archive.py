@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Cold storage for old answers.
+
+Answers older than the retention window move out of the ``progress``
+collection into zstd-compressed Parquet files, partitioned by user hash
+and month:
+
+    <archive_dir>/bucket=<hh>/month=<YYYY-MM>/<first answer id>.parquet
+
+Per-user totals of archived answers are kept in a small counters
+collection, one document per user and batch, so aggregate numbers stay
+exact without reading the archive. History reads for one user only open
+the files of that user's bucket. A lease document makes sure only one
+run (cron or admin endpoint) archives at a time.
+
+CLI (e.g. nightly from cron):
+    python archive.py --months 6 [--batch-size 10000]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from leases import acquire_lease, release_lease
+
+LEASE_ID = "archive"
+LEASE_SECONDS = 600
+
+
+class ArchiveBusy(RuntimeError):
+    """Another archive run holds the lease."""
+
+
+ARCHIVE_FIELDS = (
+    "userId", "questionId", "selectedAnswers", "textAnswer", "correctAnswers", "isCorrect", "score",
+    "timeSpent", "timestamp", "topic", "difficulty", "xpEarned", "isFirstTry",
+)
+
+
+def user_bucket(user_id: str, buckets: int) -> str:
+    # Stable across processes, unlike hash()
+    digest = hashlib.sha1(user_id.encode("utf-8")).digest()
+    return f"{int.from_bytes(digest[:4], 'big') % buckets:02x}"
+
+
+def to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Rows as plain Python values (lists, datetimes, None), ready for JSON encoding."""
+    def plain(value):
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, pd.Timestamp):
+            return value.to_pydatetime()
+        if isinstance(value, np.generic):
+            value = value.item()
+        if value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+            return None
+        return value
+
+    return [{key: plain(value) for key, value in row.items()} for row in frame.to_dict("records")]
+
+
+class AnswerArchive:
+    def __init__(self, base_dir: str, buckets: int = 64):
+        self.base_dir = Path(base_dir)
+        self.buckets = buckets
+
+    def partition_dir(self, bucket: str, month: str) -> Path:
+        return self.base_dir / f"bucket={bucket}" / f"month={month}"
+
+    def write_partition(self, bucket: str, month: str, name: str, docs: List[Dict[str, Any]]) -> Path:
+        directory = self.partition_dir(bucket, month)
+        directory.mkdir(parents=True, exist_ok=True)
+        frame = pd.DataFrame({
+            "answerId": [str(doc["_id"]) for doc in docs],
+            **{field: [doc.get(field) for doc in docs] for field in ARCHIVE_FIELDS},
+        })
+        path = directory / f"{name}.parquet"
+        tmp = directory / f".{name}.tmp"
+        frame.to_parquet(tmp, compression="zstd", index=False)
+        # Readers never see a partial file
+        os.replace(tmp, path)
+        return path
+
+    def archive(self, progress, totals, cutoff: datetime, batch_size: int = 10_000, leases=None) -> Dict[str, Any]:
+        """Move answers stored before ``cutoff`` into the archive, one batch at a time.
+
+        Per batch: write the Parquet files, store the per-user counters of
+        the batch, then delete from ``progress``. File names and counter
+        documents are keyed by the batch, so a run interrupted before the
+        delete rewrites the same files and counters instead of adding to
+        them; readers also drop duplicate answer ids. With ``leases``,
+        raises ``ArchiveBusy`` while another run is active.
+        """
+        owner = uuid.uuid4().hex
+        if leases is not None and not acquire_lease(leases, LEASE_ID, owner, LEASE_SECONDS):
+            raise ArchiveBusy("another archive run is in progress")
+        try:
+            return self._archive(progress, totals, cutoff, batch_size, leases, owner)
+        finally:
+            if leases is not None:
+                release_lease(leases, LEASE_ID, owner)
+
+    def _archive(self, progress, totals, cutoff: datetime, batch_size: int, leases, owner: str) -> Dict[str, Any]:
+        # ObjectIds encode the insert time: the _id index selects old answers, no extra index needed
+        query = {"_id": {"$lt": ObjectId.from_datetime(cutoff)}}
+        report = {"archived": 0, "files": 0, "users": 0, "cutoff": cutoff.isoformat()}
+        users = set()
+        while True:
+            # Renewed per batch, so a crashed run's lease expires but a slow one keeps it
+            if leases is not None and not acquire_lease(leases, LEASE_ID, owner, LEASE_SECONDS):
+                raise ArchiveBusy("archive lease lost")
+            docs = list(progress.find(query).sort("_id", 1).limit(batch_size))
+            if not docs:
+                break
+            batch_name = str(docs[0]["_id"])
+
+            partitions: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+            counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"totalAnswered": 0, "correctAnswers": 0, "totalXP": 0})
+            for doc in docs:
+                timestamp = doc.get("timestamp") or doc["_id"].generation_time.replace(tzinfo=None)
+                partitions[(user_bucket(doc["userId"], self.buckets), timestamp.strftime("%Y-%m"))].append(doc)
+                counter = counters[doc["userId"]]
+                counter["totalAnswered"] += 1
+                counter["correctAnswers"] += int(bool(doc.get("isCorrect")))
+                counter["totalXP"] += doc.get("xpEarned") or 0
+
+            for (bucket, month), partition_docs in partitions.items():
+                self.write_partition(bucket, month, batch_name, partition_docs)
+            # $set, not $inc: repeating a batch overwrites its counters
+            totals.bulk_write([
+                UpdateOne({"userId": user_id, "batch": batch_name},
+                          {"$set": {**counter, "archivedUntil": cutoff}}, upsert=True)
+                for user_id, counter in counters.items()
+            ], ordered=False)
+            progress.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+
+            report["archived"] += len(docs)
+            report["files"] += len(partitions)
+            users.update(counters)
+        report["users"] = len(users)
+        return report
+
+    def user_files(self, user_id: str, since: Optional[datetime] = None) -> List[Path]:
+        bucket_dir = self.base_dir / f"bucket={user_bucket(user_id, self.buckets)}"
+        if not bucket_dir.is_dir():
+            return []
+        first_month = since.strftime("%Y-%m") if since else ""
+        return [
+            path
+            for month_dir in sorted(bucket_dir.glob("month=*"))
+            if month_dir.name.split("=", 1)[1] >= first_month
+            for path in sorted(month_dir.glob("*.parquet"))
+        ]
+
+    def iter_user_months(self, user_id: str, since: Optional[datetime] = None,
+                         columns: Optional[List[str]] = None, after: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """One frame per month with the answers after ``since``, oldest first, so callers can stream long histories.
+
+        With ``after``, answers at exactly ``since`` are included when their id sorts after it.
+        """
+        files_by_month: Dict[str, List[Path]] = defaultdict(list)
+        for path in self.user_files(user_id, since):
+            files_by_month[path.parent.name].append(path)
+        read_columns = sorted({"answerId", "timestamp", *(columns or ARCHIVE_FIELDS)})
+        for month in sorted(files_by_month):
+            frames = [
+                pd.read_parquet(path, columns=read_columns, filters=[("userId", "==", user_id)])
+                for path in files_by_month[month]
+            ]
+            frame = pd.concat(frames, ignore_index=True).drop_duplicates("answerId")
+            if since is not None:
+                later = frame["timestamp"] > since
+                if after is not None:
+                    # Answer ids are ObjectId hex strings of equal length: string order is id order
+                    later |= (frame["timestamp"] == since) & (frame["answerId"] > after)
+                frame = frame[later]
+            if len(frame):
+                yield frame.sort_values(["timestamp", "answerId"], kind="stable")
+
+    def read_user(self, user_id: str, since: Optional[datetime] = None,
+                  columns: Optional[List[str]] = None) -> pd.DataFrame:
+        frames = list(self.iter_user_months(user_id, since, columns))
+        if not frames:
+            return pd.DataFrame(columns=["answerId", *(columns or ARCHIVE_FIELDS)])
+        return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=None, help="archive answers older than this (default: ARCHIVE_AFTER_MONTHS)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    # The server module is cheap to import (clients are created lazily)
+    import server
+
+    months = args.months or server.settings.archive_after_months
+    try:
+        report = server.archive_old_answers(datetime.utcnow() - timedelta(days=30 * months), args.batch_size)
+    except ArchiveBusy as e:
+        raise SystemExit(f"Not archiving: {e}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
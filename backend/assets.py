@@ -0,0 +1,127 @@
+"""Content-addressed image store with pre-generated WebP variants."""
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ASSET_URL_PREFIX = "/api/assets/"
+# <sha256>.<ext> for originals, <sha256>_<width>.webp for resized variants
+ASSET_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})(?:_(?P<width>\d{2,4}))?\.(?P<ext>png|jpe?g|gif|webp|svg)$")
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Assets are served from the app's origin: an uploaded SVG opened directly must not run
+# scripts or load anything, and no asset may be sniffed as another type
+ASSET_SECURITY_HEADERS = {
+    "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    "X-Content-Type-Options": "nosniff",
+}
+
+
+def sniff_extension(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "png"
+    if data.startswith(b"\xff\xd8"):
+        return "jpg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if b"<svg" in data[:512]:
+        return "svg"
+    raise ValueError("Unsupported image format")
+
+
+class AssetStore:
+    def __init__(self, root: str, variant_widths: Iterable[int] = (320, 640, 1280), webp_quality: int = 80):
+        self.root = Path(root)
+        self.variant_widths = tuple(sorted(variant_widths))
+        self.webp_quality = webp_quality
+
+    def path_for(self, name: str) -> Optional[Path]:
+        if not ASSET_NAME.match(name):
+            return None
+        # Two-level fan-out keeps directories small
+        return self.root / name[:2] / name
+
+    def _write(self, name: str, data: bytes):
+        path = self.path_for(name)
+        if path.exists():
+            return  # same name, same bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def put_image(self, data: bytes) -> Dict[str, object]:
+        """Store an image and its WebP variants; returns the URLs to put on the question."""
+        ext = sniff_extension(data)
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{digest}.{ext}"
+        self._write(name, data)
+
+        variants: Dict[str, str] = {}
+        if ext != "svg":
+            for width, variant in self._resize(data):
+                variant_name = f"{digest}_{width}.webp"
+                self._write(variant_name, variant)
+                variants[str(width)] = ASSET_URL_PREFIX + variant_name
+        return {"image": ASSET_URL_PREFIX + name, "imageVariants": variants}
+
+    def _resize(self, data: bytes) -> Iterable[Tuple[int, bytes]]:
+        try:
+            from PIL import Image
+        except ImportError:
+            logger.warning("Pillow not installed, skipping WebP variants")
+            return []
+
+        variants = []
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            for width in self.variant_widths:
+                # Never upscale; the original is always available
+                if width >= image.width:
+                    break
+                height = round(image.height * width / image.width)
+                buffer = io.BytesIO()
+                image.resize((width, height), Image.LANCZOS).save(buffer, "WEBP", quality=self.webp_quality)
+                variants.append((width, buffer.getvalue()))
+        return variants
+
+    def import_file(self, path: str) -> Dict[str, object]:
+        with open(path, "rb") as f:
+            return self.put_image(f.read())
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive (start, end).
+
+    Returns None for no/unsupported header (serve the whole file) and raises
+    ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[6:].strip().partition("-")
+    if not start_text:
+        length = int(end_text)
+        if length <= 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+    start = int(start_text)
+    end = min(int(end_text), size - 1) if end_text else size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
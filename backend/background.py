@@ -0,0 +1,99 @@
+"""Bounded in-process work queue for side effects that must not block a response."""
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Job = Tuple[str, Callable[..., Any], tuple, dict, int]
+
+
+class WorkQueue:
+    """Runs blocking jobs (Mongo/Firestore writes) on worker tasks off the request path.
+
+    - bounded: ``submit`` waits at most ``put_timeout`` for a free slot and
+      otherwise runs the job inline, so overload slows producers down
+      instead of dropping writes (backpressure)
+    - retries: failed jobs are retried with exponential backoff
+    - drain: ``stop`` waits for queued jobs before cancelling the workers
+    """
+
+    def __init__(self, workers: int = 4, maxsize: int = 1000, max_retries: int = 3,
+                 retry_backoff: float = 0.5, put_timeout: float = 0.05):
+        self.worker_count = workers
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.put_timeout = put_timeout
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+        self.inline = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self.workers)
+
+    def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        logger.info(f"Background queue started with {self.worker_count} workers")
+
+    async def stop(self, timeout: float = 10.0):
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Background queue drain timed out with {self.queue.qsize()} jobs pending")
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logger.info("Background queue stopped")
+
+    async def submit(self, name: str, func: Callable[..., Any], *args, **kwargs):
+        job: Job = (name, func, args, kwargs, 0)
+        if self.running:
+            try:
+                await asyncio.wait_for(self.queue.put(job), self.put_timeout)
+                return
+            except asyncio.TimeoutError:
+                logger.warning(f"Background queue full, running {name} inline")
+        self.inline += 1
+        await self._run(job)
+
+    async def _run(self, job: Job) -> bool:
+        name, func, args, kwargs, attempt = job
+        try:
+            await asyncio.to_thread(func, *args, **kwargs)
+            self.processed += 1
+            return True
+        except Exception as e:
+            if attempt < self.max_retries:
+                logger.warning(f"Background job {name} failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                return await self._run((name, func, args, kwargs, attempt + 1))
+            self.failed += 1
+            logger.error(f"Background job {name} failed permanently: {e}")
+            return False
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "processed": self.processed,
+            "failed": self.failed,
+            "inline": self.inline,
+        }
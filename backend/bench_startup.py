@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the API server.
+
+Measures, in fresh interpreters:
+  - import time of server.py (what every worker and test pays)
+  - time until /api/ready turns green (seeding + catalog warm-up; needs MongoDB)
+
+Exits non-zero when a measurement exceeds its budget, so it can gate CI:
+    python bench_startup.py --runs 5 --max-import-ms 800 --max-ready-ms 5000
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [m for m in ("firebase_admin", "google.cloud.firestore", "pandas", "numpy", "PIL") if m in sys.modules]
+print(json.dumps({"ms": elapsed, "heavy": heavy}))
+"""
+
+READY_PROBE = """
+import json, time
+start = time.perf_counter()
+import server
+from fastapi.testclient import TestClient
+with TestClient(server.app) as client:
+    deadline = start + %(timeout)f
+    while time.perf_counter() < deadline:
+        if client.get("/api/ready").status_code == 200:
+            print(json.dumps({"ms": (time.perf_counter() - start) * 1000}))
+            break
+        time.sleep(0.01)
+    else:
+        print(json.dumps({"ms": None, "steps": client.get("/api/ready").json()["steps"]}))
+"""
+
+
+def run_probe(code: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1000)
+    parser.add_argument("--max-ready-ms", type=float, default=None, help="also measure time to ready (needs MongoDB)")
+    parser.add_argument("--ready-timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    failures = []
+
+    imports = [run_probe(IMPORT_PROBE) for _ in range(args.runs)]
+    import_ms = statistics.median(run["ms"] for run in imports)
+    print(f"import server: median {import_ms:.0f} ms over {args.runs} runs")
+    heavy = sorted({module for run in imports for module in run["heavy"]})
+    if heavy:
+        failures.append(f"heavy modules imported eagerly: {', '.join(heavy)}")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import took {import_ms:.0f} ms (budget {args.max_import_ms:.0f} ms)")
+
+    if args.max_ready_ms is not None:
+        ready = run_probe(READY_PROBE % {"timeout": args.ready_timeout})
+        if ready["ms"] is None:
+            failures.append(f"not ready after {args.ready_timeout:.0f}s: {ready['steps']}")
+        else:
+            print(f"time to ready: {ready['ms']:.0f} ms")
+            if ready["ms"] > args.max_ready_ms:
+                failures.append(f"ready took {ready['ms']:.0f} ms (budget {args.max_ready_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
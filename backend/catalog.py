@@ -0,0 +1,47 @@
+"""In-memory question catalog, loaded once at warm-up and refreshed on writes.
+
+``revision`` is the store's change counter the catalog was loaded at;
+processes poll it to pick up writes made elsewhere (CLI imports, other
+API processes).
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class QuestionCatalog:
+    def __init__(self):
+        self.questions: Dict[str, Dict] = {}
+        self.version: Optional[str] = None
+        self.revision: Optional[int] = None
+        self.topics: Set[str] = set()
+        self.difficulties: Set[str] = set()
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def load(self, questions: Iterable[Dict], revision: Optional[int] = None):
+        self.questions = {question["id"]: question for question in questions}
+        self.revision = revision
+        self._update_version()
+
+    def get(self, question_id: str) -> Optional[Dict]:
+        return self.questions.get(question_id)
+
+    def all(self) -> List[Dict]:
+        return list(self.questions.values())
+
+    def update(self, question_id: str, fields: Dict):
+        if question_id in self.questions:
+            self.questions[question_id] = {**self.questions[question_id], **fields}
+            self._update_version()
+
+    def _update_version(self):
+        self.topics = {question.get("topic") for question in self.questions.values()}
+        self.difficulties = {question.get("difficulty") for question in self.questions.values()}
+        # Content hash: identical catalogs on different instances share a version
+        payload = json.dumps(
+            [self.questions[key] for key in sorted(self.questions)], sort_keys=True, default=str
+        ).encode()
+        self.version = hashlib.sha256(payload).hexdigest()[:16]
@@ -0,0 +1,283 @@
+"""Response compression: precompressed catalog payloads and streaming compression.
+
+Catalog responses only change with the catalog version, so their gzip and
+brotli variants are built once and served according to ``Accept-Encoding``:
+the warm set at maximum compression level during warm-up, other variants
+at a fast level when first requested. Everything else that is compressible
+and larger than a threshold is compressed on the fly by
+``CompressionMiddleware`` at a fast level, chunk by chunk, so streaming
+responses stay streaming.
+
+brotli is optional; without the package only gzip is offered.
+"""
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ENCODINGS = ("br", "gzip")  # server preference on equal q
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+_brotli_module: Dict[str, Any] = {}
+
+
+def brotli_module():
+    """The brotli package, or None when it is not installed."""
+    if "module" not in _brotli_module:
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        _brotli_module["module"] = brotli
+    return _brotli_module["module"]
+
+
+def available_encodings() -> Sequence[str]:
+    return ENCODINGS if brotli_module() else ("gzip",)
+
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """Best encoding from ``available`` by q-value; None means identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli_module().compress(body, quality=11 if level is None else level)
+    compressor = zlib.compressobj(9 if level is None else level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return compressor.compress(body) + compressor.flush()
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli_module().Compressor(quality=level)
+        else:
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flushed per chunk so a streamed response reaches the client as it is produced
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.finish()
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+@dataclass
+class Variants:
+    body: bytes
+    etag: str
+    media_type: str
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+class PrecompressedCache:
+    """Encoded variants per key; callers put the catalog version into the key."""
+
+    def __init__(self, max_entries: int = 256, min_size: int = 1024):
+        self.max_entries = max_entries
+        self.min_size = min_size
+        self.entries: "OrderedDict[Hashable, Variants]" = OrderedDict()
+        self.building: Dict[Hashable, threading.Event] = {}
+        self.lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+        self.coalesced = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any], media_type: str = "application/json",
+                     levels: Optional[Dict[str, int]] = None) -> Variants:
+        """Blocking: run in a thread on a miss.
+
+        ``levels`` maps encodings to compression levels; None means maximum.
+        Concurrent calls for the same key wait for one build.
+        """
+        with self.lock:
+            variants = self.entries.get(key)
+            if variants is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return variants
+            building = self.building.get(key)
+            if building is None:
+                self.building[key] = threading.Event()
+            else:
+                self.coalesced += 1
+        if building is not None:
+            building.wait()
+            # Built meanwhile, or the build failed: then try again
+            return self.get_or_build(key, build, media_type, levels)
+        try:
+            body = json.dumps(build(), ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+            # Weak ETag: the same entity in every encoding
+            variants = Variants(body, f'W/"{hashlib.sha256(body).hexdigest()[:16]}"', media_type)
+            if len(body) >= self.min_size:
+                variants.encoded = {
+                    encoding: compress(body, encoding, (levels or {}).get(encoding)) for encoding in available_encodings()
+                }
+            with self.lock:
+                self.entries[key] = variants
+                self.builds += 1
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        finally:
+            with self.lock:
+                self.building.pop(key).set()
+        return variants
+
+    def peek(self, key: Hashable) -> Optional[Variants]:
+        """Cached variants without building (cheap enough for the event loop)."""
+        with self.lock:
+            variants = self.entries.get(key)
+            if variants is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return variants
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    @staticmethod
+    def response(request: Request, variants: Variants, cache_control: str = "no-cache") -> Response:
+        headers = {"ETag": variants.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if variants.etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(status_code=304, headers=headers)
+        encoding = negotiate(request.headers.get("accept-encoding", ""), tuple(variants.encoded))
+        if encoding is None:
+            return Response(variants.body, media_type=variants.media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(variants.encoded[encoding], media_type=variants.media_type, headers=headers)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "builds": self.builds, "hits": self.hits,
+                "coalesced": self.coalesced, "encodings": list(available_encodings())}
+
+
+class CompressionMiddleware:
+    """Compresses compressible responses of at least ``minimum_size`` bytes (or streamed ones).
+
+    Requests under ``excluded_paths`` (binary assets), responses that
+    already carry a Content-Encoding (e.g. precompressed variants), partial
+    and empty responses, and binary media are passed through untouched;
+    file responses of binary media keep the server's zero-copy send.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 excluded_paths: Sequence[str] = ()):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or (self.excluded_paths and scope["path"].startswith(self.excluded_paths)):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), available_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressingSend(send, encoding, self.levels[encoding], self.minimum_size))
+
+
+class CompressingSend:
+    file_chunk_size = 64 * 1024
+
+    def __init__(self, send: Send, encoding: str, level: int, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    def eligible(self, headers: Headers) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 206, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            self.passthrough = not self.eligible(Headers(raw=message["headers"]))
+            return
+        if message["type"] == "http.response.pathsend" and not self.passthrough:
+            # A compressible file: read it here instead of letting the server send the path
+            async with await anyio.open_file(message["path"], mode="rb") as file:
+                chunk = await file.read(self.file_chunk_size)
+                while True:
+                    following = await file.read(self.file_chunk_size)
+                    await self({"type": "http.response.body", "body": chunk, "more_body": bool(following)})
+                    if not following:
+                        return
+                    chunk = following
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start is not None:
+                await self.send(self.start)
+                self.start = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.start)
+                self.start = None
+                await self.send(message)
+                return
+            self.compressor = StreamCompressor(self.encoding, self.level)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                body = self.compressor.chunk(body)
+            else:
+                body = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start)
+            self.start = None
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        body = self.compressor.chunk(body) if more_body else self.compressor.finish(body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Nightly precomputation of review plans and daily challenges.
+
+For every user active in the last ``--active-days`` days, replays the
+answer history (archived answers first, then ``progress``) through the
+Leitner rules of SpacedRepetition.js
+(``moveQuestion``, ``shouldReview``, ``calculatePriority``) and stores
+the plan for the current day in ``PLAN_TIMEZONE``, together with the
+daily challenge, as one document per (user, day) in ``daily_plans``.
+``GET /api/user/daily-plan`` is then a single document read. Plans
+expire after ``PLAN_RETENTION_DAYS``.
+
+Users are split into shards by uid hash; shards run in a process pool,
+each worker with its own MongoDB client.
+
+CLI (from cron after local midnight, e.g. at 02:00; plans the day it runs on):
+    python daily_plans.py [--date 2024-05-01] [--workers 4] [--shards 64]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+from bson import ObjectId
+from pymongo import MongoClient, ReplaceOne
+
+from gamification import MAX_LEVEL, GamificationEngine
+
+# SpacedRepetition.js boxes 1..6
+BOX_INTERVALS = {1: 1, 2: 3, 3: 7, 4: 14, 5: 30, 6: 90}
+OVERDUE_DAYS = 30
+PLAN_RETENTION_DAYS = 7
+
+# GameificationService.generateDailyChallenge
+DAILY_CHALLENGES = [
+    {"id": "answer_streak", "name": "5 richtige Antworten in Folge", "description": "Beantworte 5 Fragen richtig ohne Fehler",
+     "target": 5, "reward": {"xp": 100, "badge": None}, "type": "streak"},
+    {"id": "topic_focus", "name": "Themenspezialist", "description": "10 Fragen aus einem bestimmten Thema",
+     "target": 10, "reward": {"xp": 150, "badge": None}, "type": "topic"},
+    {"id": "speed_challenge", "name": "Geschwindigkeitstest", "description": "20 Fragen in unter 3 Minuten",
+     "target": 20, "reward": {"xp": 200, "badge": "speed_demon"}, "type": "speed"},
+    {"id": "accuracy_test", "name": "Genauigkeitstest", "description": "15 Fragen mit 90%+ Genauigkeit",
+     "target": 15, "reward": {"xp": 180, "badge": None}, "type": "accuracy"},
+]
+
+gamification = GamificationEngine()
+logger = logging.getLogger(__name__)
+
+
+def local_date(now: datetime, tz: str) -> date:
+    """Calendar day of a naive UTC time in the users' timezone."""
+    return now.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(tz)).date()
+
+
+def day_start_utc(day: date, tz: str) -> datetime:
+    # Stored timestamps are naive UTC
+    local = datetime(day.year, day.month, day.day, tzinfo=ZoneInfo(tz))
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def question_states(answers: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Leitner state per question from answers in timestamp order."""
+    states: Dict[str, Dict[str, Any]] = {}
+    for answer in answers:
+        state = states.setdefault(answer["questionId"], {"box": 1, "attempts": 0, "correctAttempts": 0, "topic": answer.get("topic")})
+        state["attempts"] += 1
+        if answer.get("isCorrect"):
+            state["correctAttempts"] += 1
+            state["box"] = min(6, state["box"] + 1)
+        else:
+            state["box"] = 1
+        state["lastReviewDate"] = answer["timestamp"]
+    return states
+
+
+def review_plan(states: Dict[str, Dict[str, Any]], plan_start: datetime, plan_size: int) -> Dict[str, Any]:
+    """Due questions and study stats as of the start of the plan day (getStudyStats/getQuestionsForReview)."""
+    due = []
+    box_distribution = {box: 0 for box in BOX_INTERVALS}
+    learned = reviewing = difficult = 0
+    accuracy_sum = 0.0
+    for question_id, state in states.items():
+        box = state["box"]
+        box_distribution[box] += 1
+        if box >= 5:
+            learned += 1
+        elif box >= 3:
+            reviewing += 1
+        else:
+            difficult += 1
+        accuracy_sum += state["correctAttempts"] / state["attempts"]
+        days_since = (plan_start - state["lastReviewDate"]).days
+        if days_since >= BOX_INTERVALS[box]:
+            due.append((box + (-10 if days_since > OVERDUE_DAYS else 0), -days_since, question_id, box))
+    due.sort()
+    return {
+        "questionIds": [question_id for _, _, question_id, _ in due[:plan_size]],
+        "boxes": {question_id: box for _, _, question_id, box in due[:plan_size]},
+        "dueToday": len(due),
+        "stats": {
+            "totalQuestions": len(states),
+            "learnedQuestions": learned,
+            "reviewingQuestions": reviewing,
+            "difficultQuestions": difficult,
+            "boxDistribution": {str(box): count for box, count in box_distribution.items()},
+            "averageAccuracy": round(accuracy_sum / len(states) * 100, 1) if states else 0,
+        },
+    }
+
+
+def daily_challenge(states: Dict[str, Dict[str, Any]], total_xp: int, day: date) -> Dict[str, Any]:
+    # Same rotation as the client: (day of year + level) % number of challenges,
+    # with the client's level numbering (calculateLevel().currentLevel starts at 0)
+    level = min(MAX_LEVEL, bisect_right(gamification.level_thresholds, total_xp))
+    challenge = dict(DAILY_CHALLENGES[(day.timetuple().tm_yday + level) % len(DAILY_CHALLENGES)])
+    if challenge["type"] == "topic":
+        # Focus on the weakest topic
+        per_topic: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for state in states.values():
+            if state.get("topic"):
+                per_topic[state["topic"]][0] += state["correctAttempts"]
+                per_topic[state["topic"]][1] += state["attempts"]
+        if per_topic:
+            challenge["topic"] = min(per_topic, key=lambda topic: (per_topic[topic][0] / per_topic[topic][1], topic))
+    return {**challenge, "date": day.isoformat(), "progress": 0, "completed": False}
+
+
+def build_plan(user_id: str, answers: Iterable[Dict[str, Any]], total_xp: int, day: date, tz: str,
+               plan_size: int) -> Dict[str, Any]:
+    states = question_states(answers)
+    return {
+        "userId": user_id,
+        "date": day.isoformat(),
+        "reviewPlan": review_plan(states, day_start_utc(day, tz), plan_size),
+        "challenge": daily_challenge(states, total_xp, day),
+        "generatedAt": datetime.utcnow(),
+    }
+
+
+def archived_answers(archive, user_id: str) -> Iterable[Dict[str, Any]]:
+    # Lazy: pandas/pyarrow are only imported for users with archived answers
+    from archive import to_records
+    for frame in archive.iter_user_months(user_id, columns=["questionId", "isCorrect", "topic"]):
+        yield from to_records(frame)
+
+
+def compute_user_plan(db, user_id: str, day: date, tz: str, plan_size: int, archive=None) -> Dict[str, Any]:
+    answers: Iterable[Dict[str, Any]] = db.progress.find(
+        {"userId": user_id}, {"_id": 0, "questionId": 1, "isCorrect": 1, "timestamp": 1, "topic": 1}
+    ).sort("timestamp", 1)
+    # Archived answers are older than every live one: without them, well-learned questions
+    # would drop out of the plan once archived
+    if archive is not None and db.progress_archive_totals.find_one({"userId": user_id}, {"_id": 1}) is not None:
+        answers = chain(archived_answers(archive, user_id), answers)
+    stats = db.user_stats.find_one({"userId": user_id}, {"_id": 0, "totalXP": 1}) or {}
+    return build_plan(user_id, answers, stats.get("totalXP", 0), day, tz, plan_size)
+
+
+def ensure_indexes(plans):
+    # One plan per user and day
+    plans.create_index([("userId", 1), ("date", 1)], unique=True)
+    plans.create_index("generatedAt", expireAfterSeconds=PLAN_RETENTION_DAYS * 24 * 3600)
+
+
+def shard_of(user_id: str, shards: int) -> int:
+    return int.from_bytes(hashlib.sha1(user_id.encode("utf-8")).digest()[:4], "big") % shards
+
+
+def active_users(db, since: datetime) -> List[str]:
+    pipeline = [
+        # ObjectIds encode the insert time, so the _id index selects recent answers
+        {"$match": {"_id": {"$gte": ObjectId.from_datetime(since)}, "userId": {"$not": {"$regex": "^guest_"}}}},
+        {"$group": {"_id": "$userId"}},
+    ]
+    return [doc["_id"] for doc in db.progress.aggregate(pipeline, allowDiskUse=True)]
+
+
+_worker_db = None
+_worker_archive = None
+
+
+def _init_worker(mongo_url: str, db_name: str, archive_dir: Optional[str] = None, archive_buckets: int = 64):
+    # MongoClient is not fork-safe: every worker process opens its own
+    global _worker_db, _worker_archive
+    logging.basicConfig(level=logging.INFO)
+    _worker_db = MongoClient(mongo_url)[db_name]
+    if archive_dir:
+        from archive import AnswerArchive
+        _worker_archive = AnswerArchive(archive_dir, archive_buckets)
+
+
+def plan_shard(user_ids: List[str], day_iso: str, tz: str, plan_size: int, write_batch: int = 500) -> Dict[str, int]:
+    day = date.fromisoformat(day_iso)
+    writes, written, failed = [], 0, 0
+    for user_id in user_ids:
+        try:
+            plan = compute_user_plan(_worker_db, user_id, day, tz, plan_size, _worker_archive)
+        except Exception as e:
+            logger.error(f"Plan for {user_id} failed: {e}")
+            failed += 1
+            continue
+        writes.append(ReplaceOne({"userId": user_id, "date": plan["date"]}, plan, upsert=True))
+        if len(writes) >= write_batch:
+            _worker_db.daily_plans.bulk_write(writes, ordered=False)
+            written += len(writes)
+            writes = []
+    if writes:
+        _worker_db.daily_plans.bulk_write(writes, ordered=False)
+        written += len(writes)
+    return {"users": written, "failed": failed}
+
+
+def run_nightly(mongo_url: str, db_name: str, day: date, tz: str, active_days: int = 30, plan_size: int = 50,
+                workers: int = 4, shards: int = 64, archive_dir: Optional[str] = None,
+                archive_buckets: int = 64) -> Dict[str, Any]:
+    started = time.perf_counter()
+    db = MongoClient(mongo_url)[db_name]
+    ensure_indexes(db.daily_plans)
+    users = active_users(db, datetime.utcnow() - timedelta(days=active_days))
+
+    shard_users: Dict[int, List[str]] = defaultdict(list)
+    for user_id in users:
+        shard_users[shard_of(user_id, shards)].append(user_id)
+
+    report = {"date": day.isoformat(), "activeUsers": len(users), "users": 0, "failed": 0, "shards": len(shard_users)}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(mongo_url, db_name, archive_dir, archive_buckets)) as pool:
+        futures = [pool.submit(plan_shard, user_ids, day.isoformat(), tz, plan_size) for user_ids in shard_users.values()]
+        for future in as_completed(futures):
+            result = future.result()
+            report["users"] += result["users"]
+            report["failed"] += result["failed"]
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date", default=None, help="plan day (default: today in PLAN_TIMEZONE)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shards", type=int, default=64)
+    args = parser.parse_args()
+
+    # The server module is cheap to import (clients are created lazily)
+    import server
+
+    settings = server.settings
+    day = date.fromisoformat(args.date) if args.date else local_date(datetime.utcnow(), settings.plan_timezone)
+    report = run_nightly(
+        settings.mongo_url, server.MONGO_DB_NAME, day, settings.plan_timezone, settings.plan_active_days,
+        settings.plan_size, args.workers or settings.plan_workers, args.shards, settings.archive_dir,
+        settings.archive_buckets,
+    )
+    print(json.dumps(report, indent=2))
+    raise SystemExit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
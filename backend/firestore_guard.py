@@ -0,0 +1,166 @@
+"""Firestore calls with deadlines, a bounded thread pool and a circuit breaker.
+
+The Firestore SDK is blocking (gRPC). Request handlers run its calls on a
+dedicated executor with a per-call deadline; while Firestore keeps failing
+the breaker opens and handlers take the MongoDB path instead, until a probe
+call after ``reset_timeout`` succeeds.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from profiling import current_profile
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Thread-safe: used from request handlers and the replication thread."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probe_started = now
+                return True
+            # One probe at a time; a probe that never reported back is replaced
+            if self.state == HALF_OPEN and now - self.probe_started >= self.reset_timeout:
+                self.probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info("Firestore circuit closed")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                if self.state == CLOSED:
+                    self.trips += 1
+                    logger.warning(f"Firestore circuit opened after {self.consecutive_failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "consecutiveFailures": self.consecutive_failures,
+            "trips": self.trips,
+            "retryInSeconds": retry_in,
+        }
+
+
+class FirestoreGuard:
+    def __init__(self, client_factory: Callable[[], Any], breaker: CircuitBreaker, workers: int = 16,
+                 max_pending: int = 64, timeout: float = 2.0):
+        self.client_factory = client_factory
+        self.breaker = breaker
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def client(self):
+        """Firestore client, or None when not configured or the breaker is open."""
+        client = self.client_factory()
+        if client is None or not self.breaker.allow():
+            return None
+        return client
+
+    async def call(self, func: Callable[..., Any], *args, **kwargs) -> Optional[Any]:
+        """Run a blocking SDK call off the event loop.
+
+        Returns None when the call timed out, failed or was rejected because
+        the pool is saturated; callers fall back to MongoDB. Pass the SDK's
+        own ``timeout`` as well, so a timed-out call also frees its thread.
+        """
+        if self.pending >= self.max_pending:
+            # Piling up more calls behind stuck ones only delays the fallback
+            self.rejected += 1
+            return None
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="firestore")
+        self.calls += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, lambda: func(*args, **kwargs))
+        # A timed-out call keeps its thread until the SDK gives up, so it stays pending until then
+        self.pending += 1
+        future.add_done_callback(self._call_done)
+        # Executor threads are not sampled by the profiler, so the wait is timed here
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            self.timeouts += 1
+            self.breaker.record_failure()
+            logger.warning(f"Firestore call timed out after {self.timeout}s")
+            return None
+        except Exception as e:
+            status = "failed"
+            self.errors += 1
+            self.breaker.record_failure()
+            logger.warning(f"Firestore call failed: {e}")
+            return None
+        finally:
+            profile = current_profile.get()
+            if profile is not None:
+                profile.firebase_calls.append({
+                    "call": getattr(func, "__qualname__", repr(func)),
+                    "durationMs": round((time.perf_counter() - started) * 1000, 3),
+                    "status": status,
+                })
+        self.breaker.record_success()
+        return result
+
+    def _call_done(self, future):
+        self.pending -= 1
+        if not future.cancelled():
+            # Marks a late failure as retrieved; it was already counted as a timeout
+            future.exception()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.snapshot(),
+            "pending": self.pending,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "rejected": self.rejected,
+        }
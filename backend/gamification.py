@@ -0,0 +1,266 @@
+"""Server-side gamification engine: XP, streaks, levels, achievements and badges.
+
+Mirrors the rules of frontend/src/services/GameificationService.js so the
+backend is the single source of truth. Achievement rules declare the stats
+they read; each answer only re-evaluates the rules whose stats it changed.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+XP_PER_CORRECT_ANSWER = 10
+XP_PER_WRONG_ANSWER = 2
+XP_PER_STREAK = 5
+XP_MULTIPLIERS = {"firstTry": 1.5, "speed": 1.2, "difficult": 2.0}
+SPEED_BONUS_SECONDS = 10
+FAST_ANSWER_SECONDS = 5
+MAX_LEVEL = 100
+
+
+@dataclass(frozen=True)
+class AchievementRule:
+    id: str
+    name: str
+    description: str
+    icon: str
+    xp_reward: int
+    depends_on: Tuple[str, ...]
+    condition: Callable[[Dict[str, Any]], bool]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "icon": self.icon,
+            "xpReward": self.xp_reward,
+        }
+
+
+def topic_accuracy(stats: Dict[str, Any], topic: str) -> float:
+    return stats.get("topicStats", {}).get(topic, {}).get("accuracy", 0)
+
+
+ACHIEVEMENTS = [
+    AchievementRule("first_question", "Erste Schritte", "Erste Frage beantwortet", "🎯", 50,
+                    ("totalQuestionsAnswered",), lambda s: s["totalQuestionsAnswered"] >= 1),
+    AchievementRule("first_correct", "Richtig geraten", "Erste richtige Antwort", "✅", 100,
+                    ("correctAnswers",), lambda s: s["correctAnswers"] >= 1),
+    AchievementRule("speed_demon", "Blitzschnell", "10 Fragen in unter 5 Sekunden beantwortet", "⚡", 200,
+                    ("fastAnswers",), lambda s: s["fastAnswers"] >= 10),
+    AchievementRule("streak_5", "Heißer Lauf", "5 richtige Antworten in Folge", "🔥", 150,
+                    ("longestStreak",), lambda s: s["longestStreak"] >= 5),
+    AchievementRule("streak_20", "Unaufhaltbar", "20 richtige Antworten in Folge", "🚀", 500,
+                    ("longestStreak",), lambda s: s["longestStreak"] >= 20),
+    AchievementRule("daily_goal", "Tägliches Ziel", "Tägliches Lernziel erreicht", "🎪", 100,
+                    ("dailyGoalAchieved",), lambda s: s["dailyGoalAchieved"] >= 1),
+    AchievementRule("week_warrior", "Wochen-Krieger", "7 Tage in Folge gelernt", "💪", 300,
+                    ("studyDaysStreak",), lambda s: s["studyDaysStreak"] >= 7),
+    # There are no server-side sessions, so "100% in 50 questions" is 50 correct in a row
+    AchievementRule("perfectionist", "Perfektionist", "100% Genauigkeit in 50 Fragen", "🎖️", 400,
+                    ("longestStreak",), lambda s: s["longestStreak"] >= 50),
+    AchievementRule("topic_master_law", "Rechts-Experte", "Alle Rechtsfragen mit 90%+ Genauigkeit", "⚖️", 250,
+                    ("topicStats.Recht",), lambda s: topic_accuracy(s, "Recht") >= 90),
+    AchievementRule("topic_master_business", "Geschäfts-Guru", "Alle kaufmännischen Fragen gemeistert", "📊", 250,
+                    ("topicStats.Kaufmännische & finanzielle Führung",),
+                    lambda s: topic_accuracy(s, "Kaufmännische & finanzielle Führung") >= 90),
+    AchievementRule("century_club", "Jahrhundert-Club", "100 Fragen beantwortet", "💯", 300,
+                    ("totalQuestionsAnswered",), lambda s: s["totalQuestionsAnswered"] >= 100),
+    AchievementRule("knowledge_seeker", "Wissensdurst", "500 Fragen beantwortet", "📚", 800,
+                    ("totalQuestionsAnswered",), lambda s: s["totalQuestionsAnswered"] >= 500),
+]
+
+
+@dataclass(frozen=True)
+class BadgeRule:
+    """Earned at most once per local day; ``condition`` reads the local time of the answer."""
+    id: str
+    name: str
+    description: str
+    icon: str
+    color: str
+    condition: Callable[[datetime], bool]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name, "description": self.description, "icon": self.icon,
+                "color": self.color}
+
+
+# GameificationService.defineBadges/checkBadges
+BADGES = [
+    BadgeRule("early_bird", "Früher Vogel", "Vor 8:00 Uhr gelernt", "🌅", "yellow", lambda local: local.hour < 8),
+    BadgeRule("night_owl", "Nachteule", "Nach 22:00 Uhr gelernt", "🦉", "purple", lambda local: local.hour >= 22),
+    BadgeRule("weekend_warrior", "Wochenend-Kämpfer", "Am Wochenende gelernt", "🏖️", "blue",
+              lambda local: local.weekday() >= 5),
+]
+
+
+def default_stats() -> Dict[str, Any]:
+    return {
+        "totalXP": 0,
+        "currentLevel": 1,
+        "totalQuestionsAnswered": 0,
+        "correctAnswers": 0,
+        "currentStreak": 0,
+        "longestStreak": 0,
+        "studyDaysStreak": 0,
+        "fastAnswers": 0,
+        "answersToday": 0,
+        "dailyGoalAchieved": 0,
+        "topicStats": {},
+        "achievements": [],
+        "badges": [],
+        "favoriteQuestions": [],
+        "difficultQuestions": [],
+        "dailyGoal": 20,
+        "weeklyGoal": 140,
+        "lastStudyDate": None,
+    }
+
+
+class GamificationEngine:
+    def __init__(self, achievements: Iterable[AchievementRule] = ACHIEVEMENTS,
+                 badges: Iterable[BadgeRule] = BADGES, tz: str = "Europe/Berlin"):
+        self.achievements = {rule.id: rule for rule in achievements}
+        self.badges = list(badges)
+        # Badges go by the learners' wall clock; stored timestamps are naive UTC
+        self.tz = ZoneInfo(tz)
+        # stat key -> rules reading it
+        self.rule_index: Dict[str, List[AchievementRule]] = defaultdict(list)
+        for rule in self.achievements.values():
+            for key in rule.depends_on:
+                self.rule_index[key].append(rule)
+        # xpRequired for levels 1..MAX_LEVEL, same curve as the client
+        self.level_thresholds = [int(100 * level ** 1.5) for level in range(1, MAX_LEVEL + 1)]
+
+    def calculate_xp(self, is_correct: bool, time_spent: int, difficulty: str, is_first_try: bool) -> Dict[str, Any]:
+        if not is_correct:
+            return {"totalXP": XP_PER_WRONG_ANSWER,
+                    "bonuses": [{"type": "participation", "amount": XP_PER_WRONG_ANSWER}]}
+
+        xp = XP_PER_CORRECT_ANSWER
+        bonuses = [{"type": "correct", "amount": xp}]
+        if time_spent < SPEED_BONUS_SECONDS:
+            bonus = int(xp * (XP_MULTIPLIERS["speed"] - 1))
+            xp += bonus
+            bonuses.append({"type": "speed", "amount": bonus})
+        if difficulty == "hard":
+            bonus = int(xp * (XP_MULTIPLIERS["difficult"] - 1))
+            xp += bonus
+            bonuses.append({"type": "difficulty", "amount": bonus})
+        if is_first_try:
+            bonus = int(xp * (XP_MULTIPLIERS["firstTry"] - 1))
+            xp += bonus
+            bonuses.append({"type": "firstTry", "amount": bonus})
+        return {"totalXP": xp, "bonuses": bonuses}
+
+    def update_streak(self, current_streak: int, is_correct: bool) -> Tuple[int, int]:
+        if not is_correct:
+            return 0, 0
+        streak = current_streak + 1
+        if streak % 10 == 0:
+            return streak, streak * XP_PER_STREAK
+        if streak % 5 == 0:
+            return streak, (streak // 5) * XP_PER_STREAK
+        return streak, 0
+
+    def calculate_level(self, total_xp: int) -> int:
+        return max(1, min(MAX_LEVEL, bisect_right(self.level_thresholds, total_xp)))
+
+    def replay(self, answers: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Stats after folding a whole answer history, oldest first, into fresh stats."""
+        stats = None
+        for event in answers:
+            stats, _ = self.apply_answer(stats, event)
+        return stats or default_stats()
+
+    def apply_answer(self, stats: Optional[Dict[str, Any]], event: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Fold one answer into a user's stats.
+
+        ``event`` carries isCorrect, timeSpent, topic, xpEarned and timestamp.
+        Returns the new stats and a summary (streak bonus, newly unlocked
+        achievements and badges, level change) of what this answer changed.
+        """
+        old = {**default_stats(), **(stats or {})}
+        new = dict(old)
+        changed: Set[str] = {"totalQuestionsAnswered"}
+        is_correct = event["isCorrect"]
+        timestamp: datetime = event["timestamp"]
+
+        new["totalQuestionsAnswered"] = old["totalQuestionsAnswered"] + 1
+        if is_correct:
+            new["correctAnswers"] = old["correctAnswers"] + 1
+            changed.add("correctAnswers")
+            if event["timeSpent"] < FAST_ANSWER_SECONDS:
+                new["fastAnswers"] = old["fastAnswers"] + 1
+                changed.add("fastAnswers")
+
+        new["currentStreak"], streak_bonus = self.update_streak(old["currentStreak"], is_correct)
+        if new["currentStreak"] > old["longestStreak"]:
+            new["longestStreak"] = new["currentStreak"]
+            changed.add("longestStreak")
+
+        # Study-day streak and daily goal
+        last = old["lastStudyDate"]
+        last_day = last.date() if isinstance(last, datetime) else None
+        today = timestamp.date()
+        if last_day != today:
+            new["answersToday"] = 0
+            new["studyDaysStreak"] = old["studyDaysStreak"] + 1 if last_day and (today - last_day).days == 1 else 1
+            if new["studyDaysStreak"] != old["studyDaysStreak"]:
+                changed.add("studyDaysStreak")
+        new["answersToday"] = new["answersToday"] + 1
+        if new["answersToday"] == new["dailyGoal"]:
+            new["dailyGoalAchieved"] = old["dailyGoalAchieved"] + 1
+            changed.add("dailyGoalAchieved")
+        new["lastStudyDate"] = timestamp
+
+        topic = event.get("topic")
+        if topic:
+            topic_stats = dict(old["topicStats"])
+            entry = dict(topic_stats.get(topic, {"answered": 0, "correct": 0, "accuracy": 0}))
+            entry["answered"] += 1
+            entry["correct"] += 1 if is_correct else 0
+            entry["accuracy"] = round(entry["correct"] / entry["answered"] * 100, 1)
+            topic_stats[topic] = entry
+            new["topicStats"] = topic_stats
+            changed.add(f"topicStats.{topic}")
+
+        # Only rules that read a changed stat can flip
+        earned = set(old["achievements"])
+        unlocked = []
+        for key in changed:
+            for rule in self.rule_index.get(key, ()):
+                if rule.id not in earned and rule.condition(new):
+                    earned.add(rule.id)
+                    unlocked.append(rule)
+        new["achievements"] = old["achievements"] + [rule.id for rule in unlocked]
+
+        # One entry per badge: the last day it was earned and how often
+        local = timestamp.replace(tzinfo=timezone.utc).astimezone(self.tz)
+        badges = {badge["id"]: badge for badge in old["badges"]}
+        new_badges = []
+        for rule in self.badges:
+            badge = badges.get(rule.id)
+            if (badge and badge["earnedDate"] == local.date().isoformat()) or not rule.condition(local):
+                continue
+            badges[rule.id] = {**rule.to_dict(), "earnedDate": local.date().isoformat(),
+                               "count": (badge or {}).get("count", 0) + 1}
+            new_badges.append(rule.to_dict())
+        if new_badges:
+            new["badges"] = list(badges.values())
+
+        xp_gained = event["xpEarned"] + streak_bonus + sum(rule.xp_reward for rule in unlocked)
+        new["totalXP"] = old["totalXP"] + xp_gained
+        new["currentLevel"] = self.calculate_level(new["totalXP"])
+
+        return new, {
+            "xpGained": xp_gained,
+            "streakBonus": streak_bonus,
+            "newAchievements": [rule.to_dict() for rule in unlocked],
+            "newBadges": new_badges,
+            "levelUp": new["currentLevel"] > old["currentLevel"],
+        }
@@ -0,0 +1,192 @@
+"""Precompiled answer matchers, one per question and language.
+
+Answer keys are parsed once when the catalog loads; grading a submission
+is a dict lookup plus the matcher call.
+
+Open questions carry an ``answerKey`` per language, e.g.::
+
+    {"de": {"keywords": ["führerschein", "fahrzeugschein|zulassungsbescheinigung"], "minMatches": 2},
+     "en": {"regex": "7[.,]5 ?million"},
+     "tr": {"numeric": 7500000, "tolerance": 0.01}}
+
+Choice questions may set ``partialCredit: true`` to score multi-select
+answers proportionally (correct picks minus wrong picks).
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_LANGUAGE = "de"
+
+# Magnitude words in de/en/tr, matched on normalized text
+MAGNITUDES = {
+    "tausend": 1e3, "tsd": 1e3, "thousand": 1e3, "bin": 1e3, "k": 1e3,
+    "million": 1e6, "millionen": 1e6, "mio": 1e6, "milyon": 1e6,
+    "milliarde": 1e9, "milliarden": 1e9, "mrd": 1e9, "billion": 1e9, "milyar": 1e9,
+}
+# Either 1-3 digits with thousands groups ("7.500.000", "7,500,000", "7 500 000"), optionally
+# followed by decimals with the other separator ("1.234,5", "1,234.5"), or plain digits with
+# optional decimals ("7,5", "7.5", "1234,567")
+NUMBER = re.compile(
+    r"(?<![\w.,])(?P<number>\d{1,3}(?P<group>[.,\s])\d{3}(?:(?P=group)\d{3})*(?:(?!(?P=group))[.,]\d+)?(?!\d)"
+    r"|\d+(?:[.,]\d+)?)(?:\s*(?P<magnitude>%s)\b)?" % "|".join(sorted(MAGNITUDES, key=len, reverse=True)))
+GERMAN_FOLDS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def normalize(text: str) -> str:
+    """Casefold, fold umlauts (ä -> ae), strip other accents and collapse whitespace."""
+    text = text.casefold().translate(GERMAN_FOLDS)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+def number_readings(token: str) -> List[float]:
+    """Values a number token can stand for, German or English notation.
+
+    A single separator followed by exactly three digits is ambiguous:
+    "7,500" and "7.500" read as both 7.5 and 7500 (unless the integer
+    part is 0). Several equal separators are thousands groups; with two
+    different separators the last one is the decimal separator.
+    """
+    separators = re.findall(r"[.,\s]", token)
+    if not separators:
+        return [float(token)]
+    if len(set(separators)) > 1 or (len(separators) > 1 and separators[0] != " "):
+        # Thousands groups, possibly followed by decimals with the other separator
+        decimal = separators[-1] if separators[-1] != separators[0] else None
+        integer, _, fraction = token.rpartition(decimal) if decimal else (token, "", "")
+        return [float(re.sub(r"[.,\s]", "", integer) + "." + (fraction or "0"))]
+    if separators[0] == " ":
+        return [float(token.replace(" ", ""))]
+    integer, fraction = re.split(r"[.,]", token)
+    as_decimal = float(f"{integer}.{fraction}")
+    if len(fraction) == 3 and len(integer) <= 3 and integer != "0":
+        return [as_decimal, float(integer + fraction)]
+    return [as_decimal]
+
+
+def parse_numbers(text: str) -> List[float]:
+    """Numbers in free text, with German or English separators and magnitude words.
+
+    Ambiguous tokens ("7,500") contribute every reading, see ``number_readings``.
+    """
+    values = []
+    for match in NUMBER.finditer(normalize(text)):
+        scale = MAGNITUDES.get(match.group("magnitude"), 1)
+        values.extend(value * scale for value in number_readings(match.group("number")))
+    return values
+
+
+@dataclass(frozen=True)
+class GradeResult:
+    correct: bool
+    score: float
+
+
+class Matcher:
+    def grade(self, selected: Sequence[int], text: Optional[str]) -> GradeResult:
+        raise NotImplementedError
+
+
+class ChoiceMatcher(Matcher):
+    def __init__(self, correct: Iterable[int], partial_credit: bool):
+        self.correct = frozenset(correct)
+        self.partial_credit = partial_credit and len(self.correct) > 1
+
+    def grade(self, selected, text):
+        chosen = frozenset(selected)
+        if chosen == self.correct:
+            return GradeResult(True, 1.0)
+        if not self.partial_credit:
+            return GradeResult(False, 0.0)
+        hits = len(chosen & self.correct)
+        wrong = len(chosen - self.correct)
+        return GradeResult(False, round(max(0.0, (hits - wrong) / len(self.correct)), 3))
+
+
+class KeywordMatcher(Matcher):
+    def __init__(self, keywords: List[str], min_matches: Optional[int]):
+        # Each keyword may list alternatives separated by "|"
+        self.patterns = [
+            re.compile(r"\b(?:%s)\b" % "|".join(re.escape(normalize(alt)) for alt in keyword.split("|")))
+            for keyword in keywords
+        ]
+        self.min_matches = min_matches or len(self.patterns)
+
+    def grade(self, selected, text):
+        normalized = normalize(text or "")
+        matches = sum(1 for pattern in self.patterns if pattern.search(normalized))
+        return GradeResult(matches >= self.min_matches, round(min(1.0, matches / self.min_matches), 3))
+
+
+class RegexMatcher(Matcher):
+    def __init__(self, pattern: str):
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+
+    def grade(self, selected, text):
+        # Matched against both the raw and the normalized answer
+        text = text or ""
+        ok = bool(self.pattern.search(text) or self.pattern.search(normalize(text)))
+        return GradeResult(ok, 1.0 if ok else 0.0)
+
+
+class NumericMatcher(Matcher):
+    def __init__(self, value: float, tolerance: float, absolute: bool):
+        self.value = float(value)
+        self.margin = tolerance if absolute else abs(self.value) * tolerance
+
+    def grade(self, selected, text):
+        ok = any(abs(number - self.value) <= self.margin for number in parse_numbers(text or ""))
+        return GradeResult(ok, 1.0 if ok else 0.0)
+
+
+def compile_key(key: Dict[str, Any]) -> Matcher:
+    if "keywords" in key:
+        return KeywordMatcher(key["keywords"], key.get("minMatches"))
+    if "regex" in key:
+        return RegexMatcher(key["regex"])
+    if "numeric" in key:
+        return NumericMatcher(key["numeric"], key.get("tolerance", 0.0), key.get("absolute", False))
+    raise ValueError(f"Unsupported answer key: {sorted(key)}")
+
+
+def compile_question(question: Dict[str, Any]) -> Dict[str, Matcher]:
+    """Matchers by language; raises ValueError for unusable answer keys."""
+    if question.get("type") != "open":
+        matcher = ChoiceMatcher(question["correctAnswer"], bool(question.get("partialCredit")))
+        return {DEFAULT_LANGUAGE: matcher}
+    answer_key = question.get("answerKey") or {}
+    if DEFAULT_LANGUAGE not in answer_key:
+        raise ValueError(f"Open question {question.get('id')} needs an answerKey for '{DEFAULT_LANGUAGE}'")
+    try:
+        return {language: compile_key(key) for language, key in answer_key.items()}
+    except (re.error, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid answerKey for question {question.get('id')}: {e}")
+
+
+class GradingEngine:
+    def __init__(self):
+        self.matchers: Dict[str, Dict[str, Matcher]] = {}
+
+    def load(self, questions: Iterable[Dict[str, Any]]) -> List[Tuple[str, str]]:
+        """Compile all questions; returns (id, error) for questions that could not be compiled."""
+        matchers, errors = {}, []
+        for question in questions:
+            try:
+                matchers[question["id"]] = compile_question(question)
+            except ValueError as e:
+                errors.append((question["id"], str(e)))
+        self.matchers = matchers
+        return errors
+
+    def matcher_for(self, question: Dict[str, Any], language: str) -> Matcher:
+        by_language = self.matchers.get(question["id"])
+        if by_language is None:
+            # Not in the catalog (e.g. read from Firestore only): compile and keep
+            by_language = self.matchers[question["id"]] = compile_question(question)
+        return by_language.get(language) or by_language[DEFAULT_LANGUAGE]
+
+    def grade(self, question: Dict[str, Any], language: str, selected: Sequence[int], text: Optional[str]) -> GradeResult:
+        return self.matcher_for(question, language).grade(selected, text)
@@ -0,0 +1,104 @@
+"""Streaming export of a user's answer history as NDJSON or CSV.
+
+Records come from the archive (oldest months) and then from a server-side
+MongoDB cursor, ordered by timestamp and answer id; output is produced
+batch by batch, so memory stays flat no matter how long the history is.
+An export is resumed by passing the timestamp and answer id of the last
+record received as ``since`` and ``after``: answers sharing that timestamp
+are told apart by their id, so none are skipped or repeated.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from bson import ObjectId
+
+EXPORT_FIELDS = (
+    "answerId", "timestamp", "questionId", "topic", "difficulty", "selectedAnswers", "textAnswer",
+    "correctAnswers", "isCorrect", "score", "timeSpent", "xpEarned", "isFirstTry",
+)
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_record(doc: Dict[str, Any]) -> Dict[str, Any]:
+    record = {field: doc.get(field) for field in EXPORT_FIELDS}
+    record["answerId"] = str(doc.get("answerId") or doc.get("_id"))
+    if isinstance(record["timestamp"], datetime):
+        record["timestamp"] = record["timestamp"].isoformat()
+    return record
+
+
+def resume_query(since: Optional[datetime], after: Optional[str]) -> Dict[str, Any]:
+    """Answers after the (timestamp, answer id) cursor; without ``after``, all answers after ``since``."""
+    if since is None:
+        return {}
+    if after is None:
+        return {"timestamp": {"$gt": since}}
+    return {"$or": [{"timestamp": {"$gt": since}}, {"timestamp": since, "_id": {"$gt": ObjectId(after)}}]}
+
+
+def iter_history(progress, user_id: str, since: Optional[datetime] = None, batch_size: int = 1000,
+                 archived: Optional[Callable[[], Iterable[List[Dict[str, Any]]]]] = None,
+                 after: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Batches of export records, oldest first; ``archived`` yields batches from cold storage.
+
+    ``after`` must be a valid answer id (ObjectId hex) when given.
+    """
+    if archived is not None:
+        for batch in archived():
+            yield [export_record(doc) for doc in batch]
+
+    query: Dict[str, Any] = {"userId": user_id, **resume_query(since, after)}
+    # Served by the (userId, timestamp, _id) index, so the sort does not buffer in the server either
+    cursor = progress.find(query, {"userId": 0}).sort([("timestamp", 1), ("_id", 1)]).batch_size(batch_size)
+    try:
+        batch = []
+        for doc in cursor:
+            batch.append(export_record(doc))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        cursor.close()
+
+
+def ndjson_chunks(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch).encode("utf-8")
+
+
+def csv_chunks(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in batches:
+        for record in batch:
+            # List columns use ';' like the question-bank CSV format
+            writer.writerow([
+                ";".join(map(str, value)) if isinstance(value, list) else ("" if value is None else value)
+                for value in (record[field] for field in EXPORT_FIELDS)
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(batches: Iterable[List[Dict[str, Any]]], fmt: str, gzip: bool = False) -> Iterator[bytes]:
+    chunks = ndjson_chunks(batches) if fmt == "ndjson" else csv_chunks(batches)
+    return gzip_chunks(chunks) if gzip else chunks
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Streaming question-bank importer.
+
+Reads JSON (top-level array), NDJSON or CSV banks record by record,
+validates each record against the Question model, collects bad rows
+without aborting and upserts valid ones in bulk batches. Memory stays
+constant regardless of the size of the bank. A stream that cannot be
+read on (malformed JSON array, bad encoding) stops the import at that
+point; the report says how far it got.
+
+CLI:
+    python importer.py bank.ndjson [--format csv] [--chunk-size 500] [--dry-run]
+"""
+
+import csv
+import io
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+
+from grading import compile_question
+
+LANGUAGES = ("de", "en", "tr")
+FORMATS = ("json", "ndjson", "csv")
+READ_SIZE = 64 * 1024
+MAX_RECORD_CHARS = 1024 * 1024
+# A decode error this far before the end of the buffer is not caused by a record cut off by the read
+INCOMPLETE_TAIL = 32
+
+Record = Tuple[int, Any]  # (row number, raw record or parse error)
+
+
+class RowError(Exception):
+    pass
+
+
+def detect_format(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if ext in ("jsonl", "ndjson"):
+        return "ndjson"
+    if ext in FORMATS:
+        return ext
+    raise ValueError(f"Cannot detect bank format from '{filename}', pass one of {', '.join(FORMATS)}")
+
+
+def iter_json_array(stream: TextIO) -> Iterator[Record]:
+    """Yield the elements of a top-level JSON array without loading the whole document."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    row = 0
+    eof = False
+    while True:
+        # Skip whitespace and separators
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != "[":
+                raise ValueError("JSON bank must be a top-level array")
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                row += 1
+                position = end
+                yield row, value
+                continue
+            except json.JSONDecodeError as e:
+                # Only read on when the element may just be incomplete, never to the end of the file
+                truncated = e.msg.startswith("Unterminated string") or e.pos + INCOMPLETE_TAIL >= len(buffer)
+                if eof or not truncated or len(buffer) - position > MAX_RECORD_CHARS:
+                    raise ValueError(f"Malformed JSON in record {row + 1}: {e.msg}")
+        if eof:
+            if started:
+                raise ValueError("Unterminated JSON array")
+            return
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_ndjson(stream: TextIO) -> Iterator[Record]:
+    for row, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, RowError(f"invalid JSON: {e.msg}")
+
+
+def csv_to_question(row: Dict[str, str]) -> Dict[str, Any]:
+    """Flat CSV columns -> Question dict.
+
+    Columns: id, type, topic, difficulty, tags (';'), correctAnswer (';'),
+    image, and per language question_<lang>, options_<lang> ('|'),
+    explanation_<lang>.
+    """
+    def localized(prefix: str) -> Dict[str, str]:
+        return {lang: row[f"{prefix}_{lang}"] for lang in LANGUAGES if row.get(f"{prefix}_{lang}")}
+
+    try:
+        correct = [int(value) for value in (row.get("correctAnswer") or "").split(";") if value.strip()]
+    except ValueError:
+        raise RowError("correctAnswer must be ';'-separated option indices")
+    return {
+        "id": row.get("id"),
+        "type": row.get("type") or "single",
+        "topic": row.get("topic"),
+        "difficulty": row.get("difficulty") or "medium",
+        "tags": [tag.strip() for tag in (row.get("tags") or "").split(";") if tag.strip()],
+        "correctAnswer": correct,
+        "image": row.get("image") or None,
+        "question": localized("question"),
+        "options": {lang: text.split("|") for lang, text in localized("options").items()},
+        "explanation": localized("explanation"),
+    }
+
+
+def iter_csv(stream: TextIO) -> Iterator[Record]:
+    # Row numbers count the header line, matching what spreadsheets show
+    for row, values in enumerate(csv.DictReader(stream), start=2):
+        try:
+            yield row, csv_to_question(values)
+        except RowError as e:
+            yield row, e
+
+
+READERS = {"json": iter_json_array, "ndjson": iter_ndjson, "csv": iter_csv}
+
+
+def validate_question(raw: Any, model) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        raise RowError("record is not an object")
+    question = model(**raw).model_dump()
+    if question["type"] not in ("single", "multiple", "open"):
+        raise RowError(f"unknown type '{question['type']}'")
+    if "de" not in question["question"]:
+        raise RowError("question text in 'de' is required")
+    if question["type"] != "open":
+        option_count = len(question["options"].get("de", []))
+        if not question["correctAnswer"] or any(i < 0 or i >= option_count for i in question["correctAnswer"]):
+            raise RowError("correctAnswer must reference existing options")
+    # Reject answer keys the grader could not compile
+    compile_question(question)
+    return question
+
+
+def import_stream(
+    records: Iterable[Record],
+    model,
+    write_chunk: Callable[[List[Dict[str, Any]]], None],
+    resolve_image: Optional[Callable[[Dict[str, Any]], None]] = None,
+    chunk_size: int = 500,
+    max_errors: int = 100,
+) -> Dict[str, Any]:
+    """Validate records and hand valid questions to ``write_chunk`` in batches.
+
+    If the stream itself fails, the questions read so far are still written
+    and the report gets ``aborted`` (the error) and ``importedThroughRow``.
+    """
+    report: Dict[str, Any] = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+    chunk: List[Dict[str, Any]] = []
+    last_row = 0
+
+    def fail(row: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"row": row, "error": message})
+
+    def flush():
+        if chunk:
+            write_chunk(chunk)
+            report["imported"] += len(chunk)
+            chunk.clear()
+
+    records = iter(records)
+    while True:
+        try:
+            row, raw = next(records)
+        except StopIteration:
+            break
+        except ValueError as e:
+            report["aborted"] = str(e)
+            report["importedThroughRow"] = last_row
+            break
+        last_row = row
+        report["processed"] += 1
+        if isinstance(raw, Exception):
+            fail(row, str(raw))
+            continue
+        try:
+            question = validate_question(raw, model)
+            if resolve_image:
+                resolve_image(question)
+        except ValidationError as e:
+            fail(row, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        except (RowError, ValueError, OSError) as e:
+            fail(row, str(e))
+            continue
+        chunk.append(question)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    return report
+
+
+def image_resolver(asset_store, base_dir: str, url_prefix: str) -> Callable[[Dict[str, Any]], None]:
+    """Replace local image paths (relative to the bank file) with content-addressed asset URLs."""
+    def resolve(question: Dict[str, Any]):
+        image = question.get("image")
+        if not image or image.startswith(url_prefix) or image.startswith(("http://", "https://")):
+            return
+        path = image if os.path.isabs(image) else os.path.join(base_dir, image)
+        question.update(asset_store.import_file(path))
+    return resolve
+
+
+def open_text(binary_stream) -> TextIO:
+    return io.TextIOWrapper(binary_stream, encoding="utf-8", newline="")
+
+
+def run_import(stream: TextIO, fmt: str, model, write_chunk: Callable[[List[Dict[str, Any]]], None],
+               chunk_size: int = 500, resolve_image: Optional[Callable[[Dict[str, Any]], None]] = None,
+               dry_run: bool = False) -> Dict[str, Any]:
+    """Import a bank through ``write_chunk``; nothing is written (or resolved) on a dry run."""
+    writer = (lambda chunk: None) if dry_run else write_chunk
+    report = import_stream(READERS[fmt](stream), model, writer, None if dry_run else resolve_image, chunk_size)
+    report["dryRun"] = dry_run
+    return report
+
+
+def main():
+    import typer
+
+    def command(
+        path: str = typer.Argument(..., help="Question bank (.json, .ndjson/.jsonl or .csv)"),
+        format: Optional[str] = typer.Option(None, help="Override format detection"),
+        chunk_size: int = typer.Option(500, help="Records per bulk write"),
+        dry_run: bool = typer.Option(False, help="Validate only, write nothing"),
+    ):
+        # The server module is cheap to import (clients are created lazily). Running servers
+        # pick up the new questions when they poll the catalog revision
+        import server
+
+        fmt = format or detect_format(path)
+        resolver = image_resolver(server.asset_store, os.path.dirname(os.path.abspath(path)), server.ASSET_URL_PREFIX)
+        with open(path, encoding="utf-8", newline="") as stream:
+            report = run_import(stream, fmt, server.Question, server.write_question_chunk, chunk_size, resolver, dry_run)
+        typer.echo(json.dumps(report, indent=2, ensure_ascii=False))
+        raise typer.Exit(code=1 if report["failed"] or report.get("aborted") else 0)
+
+    typer.run(command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Time-limited leases in MongoDB, so only one process runs a job that several may start.
+
+A lease is a document ``{_id: <job>, owner, expiresAt}``. The holder renews
+it while working; a holder that dies loses it when it expires.
+"""
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+
+def acquire_lease(leases, lease_id: str, owner: str, seconds: float) -> bool:
+    """Take or renew a lease; False while another owner holds an unexpired one."""
+    now = datetime.utcnow()
+    try:
+        leases.update_one(
+            {"_id": lease_id, "$or": [{"owner": owner}, {"expiresAt": {"$lte": now}}]},
+            {"$set": {"owner": owner, "expiresAt": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Held by someone else: the filter did not match, and the upsert hit the existing _id
+        return False
+    return True
+
+
+def release_lease(leases, lease_id: str, owner: str):
+    leases.delete_one({"_id": lease_id, "owner": owner})
@@ -0,0 +1,190 @@
+"""Opt-in request profiling: stack sampling plus MongoDB command timings.
+
+Nothing in here is installed unless profiling is enabled in Settings, so
+the hot path pays nothing when the feature is off.
+
+The sampler sees threads, not requests: the event-loop thread and the
+default executor's workers (``asyncio.to_thread``) are shared, so a
+profile also contains frames of requests that ran concurrently with the
+profiled one. Samples of an idle loop or worker are counted, not
+recorded. Profile with little concurrent traffic for clean flame graphs;
+the Mongo and Firestore timings are per request.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+# Frames from these packages are reported as Firebase/Firestore time
+FIREBASE_MODULES = ("firebase_admin", "google/cloud/firestore", "google/api_core", "grpc")
+# Innermost frames of a thread with nothing to do: the event loop waiting in its selector,
+# an executor worker waiting for a job
+IDLE_FRAMES = {("selectors.py", "select"), ("thread.py", "_worker")}
+# asyncio.to_thread runs on the loop's default executor, whose threads carry this prefix
+EXECUTOR_THREAD_PREFIX = "asyncio_"
+
+
+class StackSampler(threading.Thread):
+    """Samples the event-loop thread and the executor workers every ``interval`` seconds
+    into folded-stack counts; worker stacks are rooted at the thread name."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.worker_samples = 0
+        self.firebase_samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            frame = frames.get(self.thread_id)
+            if frame is not None:
+                if self._record(frame):
+                    self.samples += 1
+                else:
+                    self.idle_samples += 1
+            for thread in threading.enumerate():
+                if thread.name.startswith(EXECUTOR_THREAD_PREFIX) and thread.ident in frames:
+                    self.worker_samples += self._record(frames[thread.ident], thread.name)
+
+    def _record(self, frame, root: Optional[str] = None) -> bool:
+        """Count the stack unless the thread is idle; True if counted."""
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return False
+        names = []
+        in_firebase = False
+        while frame is not None:
+            code = frame.f_code
+            filename = code.co_filename.replace(os.sep, "/")
+            in_firebase = in_firebase or any(module in filename for module in FIREBASE_MODULES)
+            names.append(f"{code.co_name} ({os.path.basename(filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        if root:
+            names.append(root)
+        self.stacks[";".join(reversed(names))] += 1
+        self.firebase_samples += in_firebase
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = datetime.utcnow()
+        self.db_calls: List[Dict] = []
+        self.firebase_calls: List[Dict] = []
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self._start = 0.0
+        self.duration_ms = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def summary(self, status_code: int) -> Dict:
+        db_ms = sum(call["durationMs"] for call in self.db_calls)
+        firebase_ms = sum(call["durationMs"] for call in self.firebase_calls)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "statusCode": status_code,
+            "startedAt": self.started_at.isoformat(),
+            "durationMs": round(self.duration_ms, 2),
+            # Event-loop samples with work / idle, and busy executor-worker samples (all requests)
+            "samples": self.sampler.samples,
+            "idleSamples": self.sampler.idle_samples,
+            "workerSamples": self.sampler.worker_samples,
+            "sampleIntervalMs": self.interval * 1000,
+            "mongo": {"calls": len(self.db_calls), "totalMs": round(db_ms, 2), "commands": self.db_calls},
+            # Calls through FirestoreGuard are timed; estimatedMs is the share of busy samples
+            # with a Firebase/gRPC frame on the stack (SDK work done outside the guard, e.g. auth)
+            "firebase": {
+                "calls": len(self.firebase_calls),
+                "totalMs": round(firebase_ms, 2),
+                "estimatedMs": round(self.sampler.firebase_samples * self.interval * 1000, 2),
+                "commands": self.firebase_calls,
+            },
+        }
+
+    def write(self, directory: Path, status_code: int) -> str:
+        """Blocking file I/O: run in a thread."""
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{self.started_at:%Y%m%dT%H%M%S}_{self.id}"
+        # Folded stacks: feed to flamegraph.pl or drop into speedscope
+        with open(directory / f"{name}.folded", "w") as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(directory / f"{name}.json", "w") as f:
+            json.dump(self.summary(status_code), f, indent=2)
+        return name
+
+
+class MongoTimingListener(monitoring.CommandListener):
+    """Records command durations into the active request profile, if any."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "failed")
+
+    def _record(self, event, status: str):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.db_calls.append({
+                "command": event.command_name,
+                "database": event.database_name,
+                "durationMs": round(event.duration_micros / 1000, 3),
+                "status": status,
+            })
+
+
+def list_profiles(directory: Path, limit: int = 50) -> List[Dict]:
+    if not directory.is_dir():
+        return []
+    summaries = sorted(directory.glob("*.json"), reverse=True)[:limit]
+    result = []
+    for path in summaries:
+        try:
+            with open(path) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary.pop("mongo", None)
+        summary["name"] = path.stem
+        result.append(summary)
+    return result
@@ -0,0 +1,178 @@
+"""Admission control: per-user token buckets and per-route-class concurrency limits."""
+import hashlib
+import hmac
+import math
+import secrets
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+GUEST_ID_HEADER = "X-Guest-Id"
+GUEST_ID_REJECTED_HEADER = "X-Guest-Id-Rejected"
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+
+class RateLimiter:
+    """Token bucket per key (Firebase uid or guest id).
+
+    Buckets live in an LRU so a flood of distinct keys cannot grow memory
+    without bound; an evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: int, burst: int, max_keys: int = 100_000):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def acquire(self, key: str) -> Optional[float]:
+        """Take one token for key. Returns None if admitted, else seconds until a token is available."""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.capacity, now)
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return None
+        if self.rate <= 0:
+            return 60.0
+        return (1 - bucket.tokens) / self.rate
+
+
+class GuestIds:
+    """Server-issued guest ids, signed so clients cannot mint a fresh bucket per request.
+
+    An id is ``<random>.<hmac>``. At most ``per_ip`` distinct ids are
+    honoured per client address (LRU over addresses); requests with an
+    unknown, forged or surplus id are keyed by their address.
+    """
+
+    def __init__(self, secret: bytes, per_ip: int = 20, max_ips: int = 100_000):
+        self.secret = secret
+        self.per_ip = per_ip
+        self.max_ips = max_ips
+        self.ids_by_ip: "OrderedDict[str, OrderedDict[str, None]]" = OrderedDict()
+
+    def _signature(self, token: str) -> str:
+        return hmac.new(self.secret, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def issue(self) -> str:
+        token = secrets.token_hex(16)
+        return f"{token}.{self._signature(token)}"
+
+    def verify(self, guest_id: str) -> bool:
+        token, _, signature = guest_id.partition(".")
+        return bool(token) and len(guest_id) <= 80 and hmac.compare_digest(signature.encode("utf-8"), self._signature(token).encode("utf-8"))
+
+    def key(self, guest_id: Optional[str], ip: str) -> str:
+        if guest_id and self.verify(guest_id):
+            ids = self.ids_by_ip.get(ip)
+            if ids is None:
+                ids = self.ids_by_ip[ip] = OrderedDict()
+                if len(self.ids_by_ip) > self.max_ips:
+                    self.ids_by_ip.popitem(last=False)
+            else:
+                self.ids_by_ip.move_to_end(ip)
+            if guest_id in ids or len(ids) < self.per_ip:
+                ids[guest_id] = None
+                return f"guest:{guest_id}"
+        return f"ip:{ip}"
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"addresses": len(self.ids_by_ip), "ids": sum(len(ids) for ids in self.ids_by_ip.values())}
+
+
+class RejectedGuestIdMiddleware:
+    """Flags responses to requests whose guest id does not verify (e.g. signed with the key of
+    a previous process), so the client drops it and fetches a new one."""
+
+    def __init__(self, app: ASGIApp, guest_ids: GuestIds):
+        self.app = app
+        self.guest_ids = guest_ids
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        guest_id = Headers(scope=scope).get(GUEST_ID_HEADER) if scope["type"] == "http" else None
+        if not guest_id or self.guest_ids.verify(guest_id):
+            await self.app(scope, receive, send)
+            return
+
+        async def flagging_send(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[GUEST_ID_REJECTED_HEADER] = "1"
+            await send(message)
+
+        await self.app(scope, receive, flagging_send)
+
+
+class ConcurrencyLimiter:
+    """Non-blocking in-flight counter: requests over the limit are shed, never queued."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+
+
+class AdmissionController:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.route_classes: Dict[str, Tuple[RateLimiter, ConcurrencyLimiter]] = {}
+
+    def configure(self, route_class: str, rate_per_minute: int, burst: int, concurrency: int):
+        self.route_classes[route_class] = (RateLimiter(rate_per_minute, burst), ConcurrencyLimiter(concurrency))
+
+    def admit(self, route_class: str, key: str) -> Optional[ConcurrencyLimiter]:
+        """Admit a request or raise 429 with Retry-After.
+
+        Returns the concurrency limiter the caller must release once the
+        request is done, or None when admission control is disabled.
+        """
+        if not self.enabled or route_class not in self.route_classes:
+            return None
+        rate_limiter, concurrency_limiter = self.route_classes[route_class]
+
+        retry_after = rate_limiter.acquire(key)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+        if not concurrency_limiter.try_acquire():
+            raise HTTPException(
+                status_code=429,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        return concurrency_limiter
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"inFlight": limiter.in_flight, "limit": limiter.limit, "trackedKeys": len(rate.buckets)}
+            for name, (rate, limiter) in self.route_classes.items()
+        }
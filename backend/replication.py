@@ -0,0 +1,228 @@
+"""Mongo -> Firestore replication through an outbox collection.
+
+Writers store their change in MongoDB (the primary) and append an outbox
+entry ``{path, op, data}`` naming the Firestore document to update. The
+replicator drains the outbox in insertion order and applies it with
+batched commits. It retries with exponential backoff and never lets a
+newer entry for a document overtake an older one that is still waiting
+to be retried.
+
+Entries may carry the ``version`` of the Mongo document they copy: only
+the newest version of a document in a batch is written, and never one
+older than a version already replicated (tracked in ``versions``), so
+writers that enqueue out of order cannot roll a document back. An
+idempotency ``key`` makes enqueueing safe to retry.
+
+Every API process runs a replicator, but only the holder of the
+replication lease drains, so two processes never commit versions of one
+document in either order. The outbox is bounded: entries expire after
+``retention`` and ``enqueue`` drops new ones while the backlog is at
+``max_backlog`` (Firestore unreachable or misconfigured for long).
+
+The Firestore client is injected, so the replicator runs against the
+real service, the emulator (``FIRESTORE_EMULATOR_HOST``) or an in-memory
+stand-in in tests.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from leases import acquire_lease, release_lease
+
+logger = logging.getLogger(__name__)
+
+FIRESTORE_BATCH_LIMIT = 500
+LEASE_ID = "firestore-replication"
+
+
+def outbox_entry(path: str, data: Optional[Dict[str, Any]] = None, op: str = "set",
+                 version: Optional[int] = None, key: Optional[str] = None) -> Dict[str, Any]:
+    """``op`` is "set" (replace), "merge" (set with merge=True) or "delete"."""
+    now = datetime.utcnow()
+    entry = {"path": path, "op": op, "data": data or {}, "attempts": 0, "createdAt": now, "nextAttemptAt": now}
+    if version is not None:
+        entry["version"] = version
+    if key is not None:
+        entry["key"] = key
+    return entry
+
+
+class OutboxReplicator:
+    def __init__(self, outbox, firestore_factory: Callable[[], Any], batch_size: int = FIRESTORE_BATCH_LIMIT,
+                 max_backoff: float = 300.0, breaker=None, commit_timeout: Optional[float] = None, versions=None,
+                 leases=None, lease_seconds: float = 30.0, max_backlog: int = 100_000,
+                 retention: timedelta = timedelta(days=7)):
+        self.outbox = outbox
+        # Only the lease holder drains; the lease must outlast a batch commit (commit_timeout)
+        self.leases = leases
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self.leader = leases is None
+        self.max_backlog = max_backlog
+        self.retention = retention
+        # Outbox size as of the last drain attempt
+        self.backlog = 0
+        self.dropped = 0
+        # {_id: path, version}: newest version replicated per versioned document
+        self.versions = versions
+        self.firestore_factory = firestore_factory
+        self.batch_size = min(batch_size, FIRESTORE_BATCH_LIMIT)
+        self.max_backoff = max_backoff
+        # Optional CircuitBreaker shared with request handlers: no commits while it is open
+        self.breaker = breaker
+        self.commit_timeout = commit_timeout
+        self.replicated = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_drain: Optional[datetime] = None
+
+    def ensure_indexes(self):
+        self.outbox.create_index([("nextAttemptAt", 1), ("_id", 1)])
+        self.outbox.create_index("path")
+        self.outbox.create_index("key", unique=True, partialFilterExpression={"key": {"$exists": True}})
+        self.outbox.create_index("createdAt", expireAfterSeconds=int(self.retention.total_seconds()))
+
+    def enqueue(self, entries: Iterable[Dict[str, Any]]):
+        """Append entries; one with a ``key`` already queued is not added again.
+
+        Entries are dropped (and counted) while the backlog is full.
+        """
+        entries = list(entries)
+        if self.backlog >= self.max_backlog:
+            if not self.dropped:
+                logger.error(f"Firestore outbox holds {self.backlog} entries, dropping new ones until it drains")
+            self.dropped += len(entries)
+            return
+        keyed = [UpdateOne({"key": entry["key"]}, {"$setOnInsert": entry}, upsert=True) for entry in entries if "key" in entry]
+        plain = [entry for entry in entries if "key" not in entry]
+        if keyed:
+            self.outbox.bulk_write(keyed)
+        if plain:
+            self.outbox.insert_many(plain)
+
+    def drain_once(self) -> int:
+        """Replicate one batch; returns the number of entries applied."""
+        self.backlog = self.outbox.estimated_document_count()
+        if self.backlog < self.max_backlog:
+            self.dropped = 0
+        if self.leases is not None:
+            self.leader = acquire_lease(self.leases, LEASE_ID, self.owner, self.lease_seconds)
+            if not self.leader:
+                return 0
+        client = self.firestore_factory()
+        if client is None:
+            return 0
+        if self.breaker is not None and not self.breaker.allow():
+            return 0
+        now = datetime.utcnow()
+        self.last_drain = now
+
+        # Documents with an entry in backoff are blocked until it succeeds (per-document ordering)
+        blocked = set(self.outbox.distinct("path", {"nextAttemptAt": {"$gt": now}}))
+        entries = []
+        for entry in self.outbox.find({"nextAttemptAt": {"$lte": now}}).sort("_id", 1).limit(self.batch_size * 2):
+            if entry["path"] in blocked:
+                continue
+            entries.append(entry)
+            if len(entries) >= self.batch_size:
+                break
+        if not entries:
+            return 0
+
+        # Versioned documents: only the newest version, and never one older than already replicated
+        newest: Dict[str, int] = {}
+        for entry in entries:
+            if entry.get("version") is not None:
+                newest[entry["path"]] = max(newest.get(entry["path"], 0), entry["version"])
+        replicated = {}
+        if newest and self.versions is not None:
+            replicated = {doc["_id"]: doc["version"] for doc in self.versions.find({"_id": {"$in": list(newest)}})}
+
+        # Consecutive full replacements of the same document collapse into the last one
+        last_set = {entry["path"]: entry["_id"] for entry in entries if entry["op"] == "set"}
+        batch = client.batch()
+        for entry in entries:
+            if entry.get("version") is not None:
+                if entry["version"] < newest[entry["path"]] or entry["version"] <= replicated.get(entry["path"], 0):
+                    continue
+            elif entry["op"] == "set" and last_set[entry["path"]] != entry["_id"] and not self._has_merge_after(entries, entry):
+                continue
+            doc_ref = client.document(entry["path"])
+            if entry["op"] == "delete":
+                batch.delete(doc_ref)
+            else:
+                batch.set(doc_ref, entry["data"], merge=entry["op"] == "merge")
+
+        try:
+            batch.commit(timeout=self.commit_timeout)
+        except Exception as e:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            self._reschedule(entries, e)
+            return 0
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+        if newest and self.versions is not None:
+            self.versions.bulk_write([
+                UpdateOne({"_id": path}, {"$max": {"version": version}}, upsert=True) for path, version in newest.items()
+            ], ordered=False)
+        self.outbox.delete_many({"_id": {"$in": [entry["_id"] for entry in entries]}})
+        self.replicated += len(entries)
+        return len(entries)
+
+    @staticmethod
+    def _has_merge_after(entries: List[Dict], entry: Dict) -> bool:
+        # A later merge builds on this set, so it cannot be skipped
+        return any(other["path"] == entry["path"] and other["_id"] > entry["_id"] and other["op"] == "merge"
+                   for other in entries)
+
+    def _reschedule(self, entries: List[Dict], error: Exception):
+        self.failures += 1
+        self.last_error = str(error)
+        logger.warning(f"Firestore replication batch of {len(entries)} failed: {error}")
+        now = datetime.utcnow()
+        for entry in entries:
+            delay = min(self.max_backoff, 2 ** entry["attempts"])
+            self.outbox.update_one(
+                {"_id": entry["_id"]},
+                {"$inc": {"attempts": 1}, "$set": {"nextAttemptAt": now + timedelta(seconds=delay), "lastError": str(error)}},
+            )
+
+    async def run(self, interval: float = 1.0):
+        try:
+            while True:
+                try:
+                    applied = await asyncio.to_thread(self.drain_once)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Outbox replicator error: {e}")
+                    applied = 0
+                # Keep draining while there is a backlog
+                if applied < self.batch_size:
+                    await asyncio.sleep(interval)
+        finally:
+            if self.leases is not None and self.leader:
+                # Hand over right away instead of when the lease expires
+                try:
+                    await asyncio.to_thread(release_lease, self.leases, LEASE_ID, self.owner)
+                except Exception as e:
+                    logger.warning(f"Could not release the replication lease: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "leader": self.leader,
+            "backlog": self.backlog,
+            "dropped": self.dropped,
+            "replicated": self.replicated,
+            "failedBatches": self.failures,
+            "lastError": self.last_error,
+            "lastDrain": self.last_drain.isoformat() if self.last_drain else None,
+        }
+
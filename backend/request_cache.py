@@ -0,0 +1,76 @@
+"""Short-TTL per-key cache with single-flight loading.
+
+Concurrent requests for a key that is not cached share one load instead
+of each querying the database. ``invalidate`` drops the cached value and
+detaches a load that is still running, so a result read before a write
+is never stored after it. It may be called from worker threads.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlightCache:
+    def __init__(self, ttl: float, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            flight = self.inflight.get(key)
+            if flight is None:
+                flight = self.inflight[key] = asyncio.ensure_future(self._load(key, load))
+                self.loads += 1
+            else:
+                self.coalesced += 1
+        # A waiter that goes away (client disconnect) must not cancel the shared load
+        return await asyncio.shield(flight)
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await load()
+        except BaseException:
+            with self.lock:
+                if self.inflight.get(key) is task:
+                    del self.inflight[key]
+            raise
+        with self.lock:
+            # Only store results of loads that were not invalidated while running
+            if self.inflight.get(key) is task:
+                del self.inflight[key]
+                self.entries[key] = (time.monotonic() + self.ttl, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.inflight.pop(key, None)
+            self.invalidations += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "inFlight": len(self.inflight),
+            "hits": self.hits,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+        }
@@ -1,18 +1,39 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, Request, File, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, Field
-from pydantic_settings import BaseSettings
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from pydantic_settings import BaseSettings, NoDecode
+from typing import Annotated, List, Optional, Dict, Any, Tuple
 import os
 import json
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
 import uuid
-from datetime import datetime, timedelta
-from pymongo import MongoClient
+from datetime import datetime, timedelta, timezone
+from pymongo import MongoClient, ReplaceOne, monitoring
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from bson import ObjectId
 import logging
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
-from firebase_admin.exceptions import FirebaseError
+import asyncio
+import random
+import re
+from pathlib import Path
+from rate_limit import GUEST_ID_HEADER, GUEST_ID_REJECTED_HEADER, AdmissionController, GuestIds, RejectedGuestIdMiddleware
+from background import WorkQueue
+from gamification import GamificationEngine, default_stats
+from assets import ASSET_SECURITY_HEADERS, ASSET_URL_PREFIX, IMMUTABLE_CACHE_CONTROL, MEDIA_TYPES, AssetStore, parse_range
+from profiling import MongoTimingListener, RequestProfile, current_profile, list_profiles
+from catalog import QuestionCatalog
+from grading import GradingEngine
+from replication import OutboxReplicator, outbox_entry
+from firestore_guard import CircuitBreaker, FirestoreGuard
+from history_export import EXPORT_FORMATS, export_chunks, iter_history
+from daily_plans import compute_user_plan, ensure_indexes as ensure_plan_indexes, local_date
+from compression import CompressionMiddleware, PrecompressedCache
+from request_cache import SingleFlightCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,29 +43,174 @@ logger = logging.getLogger(__name__)
 class Settings(BaseSettings):
     mongo_url: str = Field(default="mongodb://localhost:27017", env="MONGO_URL")
     firebase_project_id: str = Field(default="taxi-learn-app", env="FIREBASE_PROJECT_ID")
+    firebase_credentials: str = Field(default="firebase-admin.json", env="FIREBASE_CREDENTIALS")
+
+    # Admission control (per-user token buckets + per-route-class concurrency caps)
+    rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
+    rate_limit_catalog_per_minute: int = Field(default=120, env="RATE_LIMIT_CATALOG_PER_MINUTE")
+    rate_limit_answer_per_minute: int = Field(default=60, env="RATE_LIMIT_ANSWER_PER_MINUTE")
+    rate_limit_progress_per_minute: int = Field(default=60, env="RATE_LIMIT_PROGRESS_PER_MINUTE")
+    rate_limit_burst: int = Field(default=20, env="RATE_LIMIT_BURST")
+    concurrency_catalog: int = Field(default=64, env="CONCURRENCY_CATALOG")
+    concurrency_answer: int = Field(default=32, env="CONCURRENCY_ANSWER")
+    concurrency_progress: int = Field(default=16, env="CONCURRENCY_PROGRESS")
+    # Guests are keyed by a server-issued, signed guest id (at most GUEST_IDS_PER_IP per
+    # address) or by their address. The address is taken from X-Forwarded-For as appended
+    # by the TRUSTED_PROXY_HOPS reverse proxies in front of the API (0: exposed directly).
+    # Set GUEST_ID_SECRET when several processes serve the API; without it each process
+    # signs with its own random key. Ids that do not verify (other process, restart) are
+    # flagged with X-Guest-Id-Rejected, and the client fetches a new one.
+    trusted_proxy_hops: int = Field(default=1, env="TRUSTED_PROXY_HOPS")
+    guest_id_secret: str = Field(default="", env="GUEST_ID_SECRET")
+    guest_ids_per_ip: int = Field(default=20, env="GUEST_IDS_PER_IP")
+
+    # Background write pipeline
+    background_workers: int = Field(default=4, env="BACKGROUND_WORKERS")
+    background_queue_size: int = Field(default=1000, env="BACKGROUND_QUEUE_SIZE")
+    background_max_retries: int = Field(default=3, env="BACKGROUND_MAX_RETRIES")
+
+    # Mongo is the primary store; Firestore is fed from an outbox that one process at a time
+    # drains (lease). Entries expire after the retention, and new ones are dropped while
+    # the backlog is full
+    replication_interval: float = Field(default=1.0, env="REPLICATION_INTERVAL")
+    replication_batch_size: int = Field(default=500, env="REPLICATION_BATCH_SIZE")
+    replication_lease_seconds: float = Field(default=30.0, env="REPLICATION_LEASE_SECONDS")
+    replication_max_backlog: int = Field(default=100000, env="REPLICATION_MAX_BACKLOG")
+    replication_retention_days: int = Field(default=7, env="REPLICATION_RETENTION_DAYS")
+
+    # Firestore reads: per-call deadline, bounded pool, circuit breaker falling back to Mongo
+    firestore_timeout: float = Field(default=2.0, env="FIRESTORE_TIMEOUT")
+    firestore_workers: int = Field(default=16, env="FIRESTORE_WORKERS")
+    firestore_max_pending: int = Field(default=64, env="FIRESTORE_MAX_PENDING")
+    firestore_breaker_failures: int = Field(default=5, env="FIRESTORE_BREAKER_FAILURES")
+    firestore_breaker_reset: float = Field(default=30.0, env="FIRESTORE_BREAKER_RESET")
+
+    # Admin access: Firebase custom claim "admin" or an explicit uid allow-list,
+    # comma-separated: ADMIN_UIDS=uid1,uid2
+    admin_uids: Annotated[List[str], NoDecode] = Field(default=[], env="ADMIN_UIDS")
+    analytics_cache_ttl: int = Field(default=900, env="ANALYTICS_CACHE_TTL")
+    analytics_batch_size: int = Field(default=10000, env="ANALYTICS_BATCH_SIZE")
+
+    # Answers older than this move from the progress collection to Parquet files
+    archive_dir: str = Field(default="archive", env="ARCHIVE_DIR")
+    archive_after_months: int = Field(default=6, env="ARCHIVE_AFTER_MONTHS")
+    archive_buckets: int = Field(default=64, env="ARCHIVE_BUCKETS")
+    archive_batch_size: int = Field(default=10000, env="ARCHIVE_BATCH_SIZE")
+    export_batch_size: int = Field(default=1000, env="EXPORT_BATCH_SIZE")
+
+    # Nightly review plans / daily challenges (daily_plans.py, run from cron)
+    plan_timezone: str = Field(default="Europe/Berlin", env="PLAN_TIMEZONE")
+    plan_active_days: int = Field(default=30, env="PLAN_ACTIVE_DAYS")
+    plan_size: int = Field(default=50, env="PLAN_SIZE")
+    plan_workers: int = Field(default=4, env="PLAN_WORKERS")
+
+    # Seconds between checks whether questions changed in another process (e.g. a CLI import)
+    catalog_refresh_interval: float = Field(default=30.0, env="CATALOG_REFRESH_INTERVAL")
+
+    # Response compression: catalog payloads precompressed per catalog version,
+    # other responses compressed on the fly above the size threshold
+    compression_enabled: bool = Field(default=True, env="COMPRESSION_ENABLED")
+    compression_min_size: int = Field(default=1024, env="COMPRESSION_MIN_SIZE")
+    compression_gzip_level: int = Field(default=6, env="COMPRESSION_GZIP_LEVEL")
+    compression_brotli_quality: int = Field(default=4, env="COMPRESSION_BROTLI_QUALITY")
+    precompressed_max_entries: int = Field(default=256, env="PRECOMPRESSED_MAX_ENTRIES")
+
+    # /api/user/progress: per-user cache, invalidated when the user answers
+    progress_cache_ttl: float = Field(default=5.0, env="PROGRESS_CACHE_TTL")
+    progress_cache_max_entries: int = Field(default=10000, env="PROGRESS_CACHE_MAX_ENTRIES")
+
+    # Question images (content-addressed, served as immutable); widths comma-separated: 320,640,1280
+    assets_dir: str = Field(default="assets", env="ASSETS_DIR")
+    image_variant_widths: Annotated[List[int], NoDecode] = Field(default=[320, 640, 1280], env="IMAGE_VARIANT_WIDTHS")
+
+    # On-demand profiling: admins send "X-Profile: 1", or a share of requests is sampled.
+    # Nothing is installed when disabled.
+    profiling_enabled: bool = Field(default=False, env="PROFILING_ENABLED")
+    profiling_sample_rate: float = Field(default=0.0, env="PROFILING_SAMPLE_RATE")
+    profiling_interval_ms: float = Field(default=5.0, env="PROFILING_INTERVAL_MS")
+    profiling_dir: str = Field(default="profiles", env="PROFILING_DIR")
     
     model_config = {"extra": "ignore"}  # Allow extra fields but ignore them
 
+    @field_validator("admin_uids", "image_variant_widths", mode="before")
+    @classmethod
+    def split_comma_list(cls, value):
+        # Environment lists are plain comma-separated values, not JSON
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        return value
+
 settings = Settings()
 
-# Initialize Firebase Admin
-try:
-    # Initialize Firebase with service account
-    cred = credentials.Certificate('firebase-admin.json')
-    firebase_admin.initialize_app(cred)
-    logger.info("Firebase Admin initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Firebase: {e}")
-
-# Initialize Firestore
-try:
-    firebase_db = firestore.client()
-    logger.info("Firestore client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Firestore: {e}")
-    firebase_db = None
-
-app = FastAPI(title="IHK Taxi Exam API", version="2.0.0")
+# Firebase Admin and Firestore are imported and initialized on first use (or during
+# warm-up), so importing this module stays cheap
+firebase_lock = threading.Lock()
+firebase_state: Dict[str, Any] = {"initialized": False, "app": None, "firestore": None, "retry_at": 0.0, "error": None}
+FIREBASE_RETRY_SECONDS = 30.0
+
+def firebase_configured() -> bool:
+    # Credentials that failed to load (e.g. malformed) do not count until a retry succeeds
+    return os.path.exists(settings.firebase_credentials) and firebase_state["error"] is None
+
+def init_firebase():
+    # Concurrent callers wait here until the first one has finished; "initialized" is only
+    # set once the clients exist, and a failed attempt is retried after FIREBASE_RETRY_SECONDS
+    with firebase_lock:
+        if firebase_state["initialized"] or time.monotonic() < firebase_state["retry_at"]:
+            return
+        firebase_state["retry_at"] = time.monotonic() + FIREBASE_RETRY_SECONDS
+        if firebase_state["app"] is None:
+            try:
+                import firebase_admin
+                from firebase_admin import credentials
+                # Initialize Firebase with service account
+                cred = credentials.Certificate(settings.firebase_credentials)
+                firebase_state["app"] = firebase_admin.initialize_app(cred)
+                logger.info("Firebase Admin initialized successfully")
+            except Exception as e:
+                firebase_state["error"] = str(e)
+                logger.error(f"Failed to initialize Firebase: {e}")
+                return
+        try:
+            from firebase_admin import firestore
+            firebase_state["firestore"] = firestore.client()
+            logger.info("Firestore client initialized successfully")
+        except Exception as e:
+            firebase_state["error"] = str(e)
+            logger.error(f"Failed to initialize Firestore: {e}")
+            return
+        firebase_state["error"] = None
+        firebase_state["initialized"] = True
+
+def get_firestore():
+    """Firestore client, or None when Firebase is not configured (or not reachable yet)"""
+    if not firebase_state["initialized"]:
+        init_firebase()
+    return firebase_state["firestore"]
+
+def verify_token(token: str) -> Dict:
+    if not firebase_state["initialized"]:
+        init_firebase()
+    from firebase_admin import auth
+    return auth.verify_id_token(token)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    work_queue.start()
+    # Seeding and cache warm-up run after the server starts accepting connections;
+    # /api/ready reports when they are done
+    warmup_task = asyncio.create_task(warm_up())
+    replication_task = asyncio.create_task(replicator.run(settings.replication_interval))
+    catalog_task = asyncio.create_task(refresh_catalog(settings.catalog_refresh_interval))
+    yield
+    warmup_task.cancel()
+    replication_task.cancel()
+    catalog_task.cancel()
+    # Drain pending progress writes before the process exits
+    await work_queue.stop()
+    firestore.shutdown()
+
+app = FastAPI(title="IHK Taxi Exam API", version="2.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -53,21 +219,112 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[GUEST_ID_REJECTED_HEADER],
 )
 
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        excluded_paths=(ASSET_URL_PREFIX,),
+    )
+
 # MongoDB connection (fallback)
 MONGO_URL = settings.mongo_url
-mongo_client = MongoClient(MONGO_URL)
-mongo_db = mongo_client.ihk_taxi_app
+if settings.profiling_enabled:
+    # Must be registered before the client is created
+    monitoring.register(MongoTimingListener())
+mongo_lock = threading.Lock()
+mongo_state: Dict[str, Any] = {"client": None}
+MONGO_DB_NAME = "ihk_taxi_app"
+
+def get_mongo_db():
+    if mongo_state["client"] is None:
+        with mongo_lock:
+            if mongo_state["client"] is None:
+                mongo_state["client"] = MongoClient(MONGO_URL)
+    return mongo_state["client"][MONGO_DB_NAME]
+
+class LazyCollection:
+    """Resolves to the Mongo collection on first attribute access"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_mongo_db()[self.name], attr)
 
 # Collections
-questions_collection = mongo_db.questions
-users_collection = mongo_db.users
-progress_collection = mongo_db.progress
-sessions_collection = mongo_db.sessions
+questions_collection = LazyCollection("questions")
+users_collection = LazyCollection("users")
+progress_collection = LazyCollection("progress")
+sessions_collection = LazyCollection("sessions")
+user_stats_collection = LazyCollection("user_stats")
+outbox_collection = LazyCollection("firestore_outbox")
+replicated_versions_collection = LazyCollection("firestore_versions")
+archive_totals_collection = LazyCollection("progress_archive_totals")
+leases_collection = LazyCollection("job_leases")
+daily_plans_collection = LazyCollection("daily_plans")
+catalog_meta_collection = LazyCollection("catalog_meta")
+
+# Every Firestore call goes through the guard; while the breaker is open, reads use Mongo
+# and replication pauses
+firestore = FirestoreGuard(
+    get_firestore,
+    CircuitBreaker(settings.firestore_breaker_failures, settings.firestore_breaker_reset),
+    workers=settings.firestore_workers,
+    max_pending=settings.firestore_max_pending,
+    timeout=settings.firestore_timeout,
+)
+
+# Drains the outbox into Firestore with batched commits
+replicator = OutboxReplicator(
+    outbox_collection, get_firestore, settings.replication_batch_size,
+    breaker=firestore.breaker, commit_timeout=settings.firestore_timeout * 5, versions=replicated_versions_collection,
+    leases=leases_collection,
+    # Outlasts a batch commit, so the lease cannot pass to another process during one
+    lease_seconds=max(settings.replication_lease_seconds, settings.firestore_timeout * 15),
+    max_backlog=settings.replication_max_backlog,
+    retention=timedelta(days=settings.replication_retention_days),
+)
+
+def replicate(*entries: Dict):
+    # Only queue changes when there is a Firestore to replicate to: configured, and its
+    # credentials loaded or not tried yet. Entries queued before it is initialized are
+    # replicated once it is
+    if entries and firebase_configured():
+        replicator.enqueue(entries)
+
+# Questions by id, loaded during warm-up, and their precompiled answer matchers
+catalog = QuestionCatalog()
+grader = GradingEngine()
+readiness: Dict[str, Any] = {"ready": False, "steps": {}}
+# Encoded catalog responses, keyed by catalog version
+precompressed = PrecompressedCache(settings.precompressed_max_entries, settings.compression_min_size)
+# Maximum compression for the warm set only; variants built on request use the fast levels
+ON_DEMAND_COMPRESSION_LEVELS = {"gzip": settings.compression_gzip_level, "br": settings.compression_brotli_quality}
+# Progress responses by uid
+progress_cache = SingleFlightCache(settings.progress_cache_ttl, settings.progress_cache_max_entries)
 
 # Security
 security = HTTPBearer()
+# Guests send no Authorization header: no 403, the route sees None
+optional_security = HTTPBearer(auto_error=False)
+
+# Question images
+asset_store = AssetStore(settings.assets_dir, settings.image_variant_widths)
+
+# XP, streaks, levels and achievements (single source of truth for all devices)
+gamification = GamificationEngine(tz=settings.plan_timezone)
+
+# Progress/gamification writes run here, off the request path
+work_queue = WorkQueue(
+    workers=settings.background_workers,
+    maxsize=settings.background_queue_size,
+    max_retries=settings.background_max_retries,
+)
 
 # Pydantic models
 class Question(BaseModel):
@@ -81,10 +338,14 @@ class Question(BaseModel):
     difficulty: str = "medium"
     tags: List[str] = []
     image: Optional[str] = None
+    imageVariants: Dict[str, str] = {}  # width -> WebP variant URL
+    answerKey: Optional[Dict[str, Dict[str, Any]]] = None  # per-language key for open questions, see grading.py
+    partialCredit: bool = False  # proportional score for multi-select
 
 class QuestionAnswer(BaseModel):
     questionId: str
-    selectedAnswers: List[int]
+    selectedAnswers: List[int] = []
+    textAnswer: Optional[str] = None  # open questions
     timeSpent: int
     isFirstTry: bool = True
 
@@ -220,49 +481,270 @@ EXTENDED_QUESTION_BANK = [
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict:
     try:
         # Verify Firebase ID token
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        decoded_token = verify_token(credentials.credentials)
         return decoded_token
-    except FirebaseError as e:
-        logger.error(f"Firebase authentication failed: {e}")
-        raise HTTPException(status_code=401, detail="Invalid authentication token")
     except Exception as e:
+        from firebase_admin.exceptions import FirebaseError
+        if isinstance(e, FirebaseError):
+            logger.error(f"Firebase authentication failed: {e}")
+            raise HTTPException(status_code=401, detail="Invalid authentication token")
         logger.error(f"Authentication error: {e}")
         # Allow guest users or fallback authentication
         return {"uid": "guest", "email": None, "name": "Guest User"}
 
 # Optional authentication (allows both authenticated and guest users)
-async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> Optional[Dict]:
+async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[Dict]:
     if not credentials:
         return None
     try:
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        decoded_token = verify_token(credentials.credentials)
         return decoded_token
     except:
         return None
 
-# Initialize database with questions
-@app.on_event("startup")
-async def startup_event():
+# Admin-only endpoints
+def is_admin(user: Optional[Dict]) -> bool:
+    return bool(user) and (user.get("admin") is True or user.get("uid") in settings.admin_uids)
+
+async def get_admin_user(user: Dict = Depends(get_current_user)) -> Dict:
+    if is_admin(user):
+        return user
+    raise HTTPException(status_code=403, detail="Admin access required")
+
+PROFILES_DIR = Path(settings.profiling_dir)
+PROFILE_NAME = re.compile(r"^\d{8}T\d{6}_[0-9a-f]{12}$")
+
+def should_profile(request: Request) -> bool:
+    if request.headers.get("X-Profile"):
+        # Only verify the token when a profile is actually requested
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        try:
+            return scheme.lower() == "bearer" and is_admin(verify_token(token))
+        except Exception:
+            return False
+    return random.random() < settings.profiling_sample_rate
+
+if settings.profiling_enabled:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        if not should_profile(request):
+            return await call_next(request)
+
+        profile = RequestProfile(request.method, request.url.path, settings.profiling_interval_ms / 1000)
+        token = current_profile.set(profile)
+        status_code = 500
+        profile.start()
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            response.headers["X-Profile-Id"] = profile.id
+            return response
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            try:
+                name = await asyncio.to_thread(profile.write, PROFILES_DIR, status_code)
+                logger.info(f"Profiled {request.method} {request.url.path} in {profile.duration_ms:.1f} ms -> {name}")
+            except Exception as e:
+                logger.error(f"Failed to write profile: {e}")
+
+# Admission control: shed load early with 429 instead of queueing on the Mongo pool
+admission = AdmissionController(enabled=settings.rate_limit_enabled)
+admission.configure("catalog", settings.rate_limit_catalog_per_minute, settings.rate_limit_burst, settings.concurrency_catalog)
+admission.configure("answer", settings.rate_limit_answer_per_minute, settings.rate_limit_burst, settings.concurrency_answer)
+admission.configure("progress", settings.rate_limit_progress_per_minute, settings.rate_limit_burst, settings.concurrency_progress)
+
+guest_ids = GuestIds(
+    settings.guest_id_secret.encode("utf-8") if settings.guest_id_secret else os.urandom(32), settings.guest_ids_per_ip
+)
+app.add_middleware(RejectedGuestIdMiddleware, guest_ids=guest_ids)
+
+def client_ip(request: Request) -> str:
+    # The last TRUSTED_PROXY_HOPS entries of X-Forwarded-For were added by our proxies;
+    # anything to the left of them is client-controlled
+    hops = settings.trusted_proxy_hops
+    if hops > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else "unknown"
+
+def client_key(request: Request, user: Optional[Dict]) -> str:
+    # Firebase uid for signed-in users, otherwise a server-issued guest id or the client address
+    if user and user.get("uid") and user["uid"] != "guest":
+        return f"uid:{user['uid']}"
+    return guest_ids.key(request.headers.get(GUEST_ID_HEADER), client_ip(request))
+
+def admit(route_class: str, user_dependency=None):
+    # Reuses the route's own auth dependency so the token is verified only once per request;
+    # routes without auth are keyed by guest id / client address
+    async def no_user() -> Optional[Dict]:
+        return None
+
+    async def dependency(request: Request, user: Optional[Dict] = Depends(user_dependency or no_user)):
+        limiter = admission.admit(route_class, client_key(request, user))
+        try:
+            yield
+        finally:
+            if limiter:
+                limiter.release()
+    return dependency
+
+def ingest_question_images(questions: List[Dict]):
+    # Questions may reference a local image file; store it content-addressed and point to the asset URL
+    for question in questions:
+        image = question.get("image")
+        if image and not image.startswith(ASSET_URL_PREFIX) and os.path.isfile(image):
+            question.update(asset_store.import_file(image))
+
+def seed_mongo():
+    questions_collection.create_index("id", unique=True)
+    user_stats_collection.create_index("userId", unique=True)
+    # Archive counters: one document per user and batch
+    archive_totals_collection.create_index([("userId", 1), ("batch", 1)], unique=True)
+    # History exports sort and resume on (timestamp, _id)
+    progress_collection.create_index([("userId", 1), ("timestamp", 1), ("_id", 1)])
+    ensure_plan_indexes(daily_plans_collection)
+    replicator.ensure_indexes()
+    ingest_question_images(EXTENDED_QUESTION_BANK)
+    # Upsert by id instead of wiping the collection: restarts are idempotent and cheap
+    write_question_chunk(EXTENDED_QUESTION_BANK)
+    logger.info(f"Initialized {len(EXTENDED_QUESTION_BANK)} questions in database")
+
+def write_question_chunk(questions: List[Dict]):
+    # One bulk upsert per chunk in Mongo; Firestore gets them through the outbox
+    result = questions_collection.bulk_write(
+        [ReplaceOne({"id": q["id"]}, q, upsert=True) for q in questions], ordered=False
+    )
+    if result.upserted_count or result.modified_count:
+        bump_catalog_revision()
+    replicate(*(outbox_entry(f"questions/{q['id']}", {k: v for k, v in q.items() if k != "_id"}) for q in questions))
+
+def bump_catalog_revision():
+    # Every process reloads its catalog (and grader) when it sees a new revision
+    catalog_meta_collection.update_one(
+        {"_id": "questions"}, {"$inc": {"revision": 1}, "$set": {"changedAt": datetime.utcnow()}}, upsert=True
+    )
+
+def catalog_revision() -> int:
+    doc = catalog_meta_collection.find_one({"_id": "questions"}, {"revision": 1})
+    return doc["revision"] if doc else 0
+
+def load_catalog():
+    # Read the revision first: a write during the load is picked up by the next poll
+    revision = catalog_revision()
+    catalog.load(questions_collection.find({}, {"_id": 0}), revision)
+    for question_id, error in grader.load(catalog.all()):
+        logger.error(f"Cannot grade question {question_id}: {error}")
+    logger.info(f"Question catalog loaded: {len(catalog.questions)} questions, version {catalog.version}")
+
+async def refresh_catalog(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if catalog.loaded and await asyncio.to_thread(catalog_revision) != catalog.revision:
+                await asyncio.to_thread(load_catalog)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Catalog refresh failed: {e}")
+
+def localize_question(q: Dict, language: str) -> Dict:
+    return {
+        "id": q["id"],
+        "question": q["question"].get(language, q["question"]["de"]),
+        "type": q["type"],
+        "options": q["options"].get(language, q["options"]["de"]),
+        "correctAnswer": q["correctAnswer"],
+        "topic": q["topic"],
+        "difficulty": q["difficulty"],
+        "tags": q["tags"],
+        "image": q["image"],
+        "imageVariants": q.get("imageVariants", {})
+    }
+
+async def find_question(question_id: str) -> Optional[Dict]:
+    """A question from the catalog, else from MongoDB (the primary store). The Firestore
+    replica is only read while MongoDB fails; it may lag behind."""
+    question = catalog.get(question_id)
+    if question is not None:
+        return question
     try:
-        # Clear and initialize MongoDB questions collection
-        questions_collection.delete_many({})
-        questions_collection.insert_many(EXTENDED_QUESTION_BANK)
-        
-        # Initialize Firestore questions collection
-        if firebase_db:
-            questions_ref = firebase_db.collection('questions')
-            batch = firebase_db.batch()
-            
-            for question in EXTENDED_QUESTION_BANK:
-                doc_ref = questions_ref.document(question['id'])
-                batch.set(doc_ref, question)
-            
-            batch.commit()
-            logger.info("Firestore questions collection initialized")
-        
-        logger.info(f"Initialized {len(EXTENDED_QUESTION_BANK)} questions in database")
-    except Exception as e:
-        logger.error(f"Startup error: {e}")
+        return questions_collection.find_one({"id": question_id}, {"_id": 0})
+    except PyMongoError as e:
+        firebase_db = firestore.client()
+        if firebase_db is None:
+            raise
+        logger.warning(f"MongoDB unavailable, reading question {question_id} from Firestore: {e}")
+    doc = await firestore.call(firebase_db.collection('questions').document(question_id).get, timeout=firestore.timeout)
+    return doc.to_dict() if doc is not None and doc.exists else None
+
+QUESTION_LANGUAGES = ("de", "en", "tr")
+# Catalog responses are cached for these limits only; others are built per request
+CACHED_QUESTION_LIMITS = (None, 10, 20, 50, 100)
+
+def catalog_questions(topic: Optional[str], difficulty: Optional[str], language: str, limit: Optional[int]) -> List[Dict]:
+    questions = [
+        q for q in catalog.all()
+        if (not topic or q["topic"] == topic) and (not difficulty or q["difficulty"] == difficulty)
+    ]
+    return [localize_question(q, language) for q in questions[:limit or None]]
+
+def topic_summary() -> List[Dict]:
+    pipeline = [
+        {"$group": {
+            "_id": "$topic",
+            "count": {"$sum": 1},
+            "difficulties": {"$addToSet": "$difficulty"}
+        }},
+        {"$project": {
+            "topic": "$_id",
+            "totalQuestions": "$count",
+            "difficulties": "$difficulties",
+            "_id": 0
+        }},
+        {"$sort": {"topic": 1}}
+    ]
+    return list(questions_collection.aggregate(pipeline))
+
+def warm_responses():
+    # Full catalog per language and the topic list, encoded once per catalog version
+    precompressed.clear()
+    for language in ("de", "en", "tr"):
+        precompressed.get_or_build(("questions", catalog.version, None, None, language, None),
+                                   lambda: catalog_questions(None, None, language, None))
+    precompressed.get_or_build(("topics", catalog.version), topic_summary)
+
+def warm_firebase():
+    # So the first authenticated request does not pay for SDK import and initialization.
+    # get_firestore() logs and swallows errors: report configured-but-broken as failed
+    if get_firestore() is None and os.path.exists(settings.firebase_credentials):
+        raise RuntimeError(firebase_state["error"] or "Firebase is not initialized")
+
+WARMUP_MAX_BACKOFF = 60.0
+
+async def warm_up():
+    # Mongo seeding and the catalog are required for readiness and retried with backoff
+    # until they succeed; Firebase and the response cache are optional
+    for name, step, required in (("mongo", seed_mongo, True), ("catalog", load_catalog, True),
+                                 ("responses", warm_responses, False), ("firebase", warm_firebase, False)):
+        started = datetime.utcnow()
+        attempt = 0
+        while True:
+            try:
+                await asyncio.to_thread(step)
+                readiness["steps"][name] = "ok"
+                break
+            except Exception as e:
+                logger.error(f"Warm-up step {name} failed: {e}")
+                if not required:
+                    readiness["steps"][name] = "failed"
+                    break
+                readiness["steps"][name] = "retrying"
+                await asyncio.sleep(min(WARMUP_MAX_BACKOFF, 2 ** attempt))
+                attempt += 1
+        logger.info(f"Warm-up step {name} took {(datetime.utcnow() - started).total_seconds():.2f}s")
+    readiness["ready"] = True
 
 # API Routes
 
@@ -271,85 +753,94 @@ async def health_check():
     return {
         "status": "ok", 
         "message": "IHK Taxi Exam API v2.0 with Firebase integration",
-        "features": ["spaced_repetition", "gamification", "multilingual", "firebase_auth", "offline_sync"]
+        "features": ["spaced_repetition", "gamification", "multilingual", "firebase_auth", "offline_sync"],
+        "admission": admission.snapshot(),
+        "guestIds": guest_ids.snapshot(),
+        "backgroundQueue": work_queue.snapshot(),
+        "replication": replicator.snapshot(),
+        "firestore": firestore.snapshot(),
+        "precompressed": precompressed.snapshot(),
+        "progressCache": progress_cache.snapshot()
     }
 
-@app.get("/api/questions")
+@app.post("/api/guest-id", dependencies=[Depends(admit("catalog"))])
+async def issue_guest_id():
+    """A signed guest id; guests send it as X-Guest-Id to get their own rate limit"""
+    return {"guestId": guest_ids.issue()}
+
+@app.get("/api/ready")
+async def readiness_check():
+    status_code = 200 if readiness["ready"] else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"status": "ready" if readiness["ready"] else "starting", "steps": readiness["steps"]},
+    )
+
+@app.get("/api/questions", dependencies=[Depends(admit("catalog", get_optional_user))])
 async def get_questions(
+    request: Request,
     topic: Optional[str] = None,
     difficulty: Optional[str] = None,
     language: Optional[str] = "de",
-    limit: Optional[int] = None,
-    user: Optional[Dict] = Depends(get_optional_user)
+    limit: Optional[int] = None
 ):
     try:
-        # Build query
+        if catalog.loaded:
+            # Served from the catalog for everyone: the encoded response is built once per
+            # catalog version. Unknown languages fall back to German anyway; other unknown
+            # parameters are not cached, so arbitrary query strings cannot fill the cache
+            topic, difficulty = topic or None, difficulty or None
+            language = language if language in QUESTION_LANGUAGES else "de"
+            if (limit not in CACHED_QUESTION_LIMITS or (topic is not None and topic not in catalog.topics)
+                    or (difficulty is not None and difficulty not in catalog.difficulties)):
+                return catalog_questions(topic, difficulty, language, limit)
+            key = ("questions", catalog.version, topic, difficulty, language, limit)
+            variants = precompressed.peek(key) or await asyncio.to_thread(
+                precompressed.get_or_build, key, lambda: catalog_questions(topic, difficulty, language, limit),
+                levels=ON_DEMAND_COMPRESSION_LEVELS,
+            )
+            return PrecompressedCache.response(request, variants)
+
+        # Catalog not loaded yet (warm-up): MongoDB, or the Firestore replica while MongoDB fails
         query = {}
         if topic:
             query["topic"] = topic
         if difficulty:
             query["difficulty"] = difficulty
-        
-        # Get questions from Firebase or MongoDB
-        if firebase_db and user:
-            questions_ref = firebase_db.collection('questions')
-            query_ref = questions_ref
-            
+        try:
+            cursor = questions_collection.find(query, {"_id": 0})
+            questions = list(cursor.limit(limit) if limit else cursor)
+        except PyMongoError as e:
+            firebase_db = firestore.client()
+            if firebase_db is None:
+                raise
+            logger.warning(f"MongoDB unavailable, reading questions from Firestore: {e}")
+            query_ref = firebase_db.collection('questions')
             for key, value in query.items():
                 query_ref = query_ref.where(key, '==', value)
-            
             if limit:
                 query_ref = query_ref.limit(limit)
-                
-            docs = query_ref.get()
+            docs = await firestore.call(query_ref.get, timeout=firestore.timeout)
+            if docs is None:
+                raise
             questions = [doc.to_dict() for doc in docs]
-        else:
-            # Fallback to MongoDB
-            questions = list(questions_collection.find(query, {"_id": 0}))
-            if limit:
-                questions = questions[:limit]
         
         # Filter by language for response
-        localized_questions = []
-        for q in questions:
-            localized_q = {
-                "id": q["id"],
-                "question": q["question"].get(language, q["question"]["de"]),
-                "type": q["type"],
-                "options": q["options"].get(language, q["options"]["de"]),
-                "correctAnswer": q["correctAnswer"],
-                "topic": q["topic"],
-                "difficulty": q["difficulty"],
-                "tags": q["tags"],
-                "image": q["image"]
-            }
-            localized_questions.append(localized_q)
-        
-        return localized_questions
+        return [localize_question(q, language) for q in questions]
         
     except Exception as e:
         logger.error(f"Error fetching questions: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch questions")
 
-@app.get("/api/questions/{question_id}")
+@app.get("/api/questions/{question_id}", dependencies=[Depends(admit("catalog", get_optional_user))])
 async def get_question(
     question_id: str, 
-    language: Optional[str] = "de",
-    user: Optional[Dict] = Depends(get_optional_user)
+    language: Optional[str] = "de"
 ):
     try:
-        # Get from Firebase or MongoDB
-        if firebase_db and user:
-            doc_ref = firebase_db.collection('questions').document(question_id)
-            doc = doc_ref.get()
-            if doc.exists:
-                question = doc.to_dict()
-            else:
-                raise HTTPException(status_code=404, detail="Question not found")
-        else:
-            question = questions_collection.find_one({"id": question_id}, {"_id": 0})
-            if not question:
-                raise HTTPException(status_code=404, detail="Question not found")
+        question = await find_question(question_id)
+        if not question:
+            raise HTTPException(status_code=404, detail="Question not found")
         
         # Localize response
         return {
@@ -362,14 +853,17 @@ async def get_question(
             "topic": question["topic"],
             "difficulty": question["difficulty"],
             "tags": question["tags"],
-            "image": question["image"]
+            "image": question["image"],
+            "imageVariants": question.get("imageVariants", {})
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching question {question_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch question")
 
-@app.get("/api/random-question")
+@app.get("/api/random-question", dependencies=[Depends(admit("catalog", get_optional_user))])
 async def get_random_question(
     topic: Optional[str] = None,
     difficulty: Optional[str] = None,
@@ -409,181 +903,387 @@ async def get_random_question(
             "topic": question["topic"],
             "difficulty": question["difficulty"],
             "tags": question["tags"],
-            "image": question["image"]
+            "image": question["image"],
+            "imageVariants": question.get("imageVariants", {})
         }
         
     except Exception as e:
         logger.error(f"Error fetching random question: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch random question")
 
-@app.post("/api/answer")
+# Answer ids already folded into a user's stats, so a retried job does not apply one twice
+RECENT_ANSWER_IDS = 100
+
+def save_progress(progress_data: Dict, replicate_to_firestore: bool):
+    # MongoDB is the primary store; the answer id doubles as the Firestore document id.
+    # The id is assigned by the caller, so each step is safe to retry
+    answer_id = progress_data["_id"]
+    try:
+        progress_collection.insert_one(progress_data)
+    except DuplicateKeyError:
+        pass
+    if replicate_to_firestore:
+        data = {k: v for k, v in progress_data.items() if k != "_id"}
+        path = f"user_progress/{progress_data['userId']}/answers/{answer_id}"
+        replicate(outbox_entry(path, data, key=path))
+    # Reads cached while the write was queued are stale now
+    progress_cache.invalidate(progress_data["userId"])
+
+def stats_event(doc: Dict) -> Dict:
+    """The fields of a stored answer the gamification engine reads."""
+    return {
+        "answerId": str(doc.get("answerId") or doc.get("_id")),
+        "isCorrect": bool(doc.get("isCorrect")),
+        "timeSpent": doc.get("timeSpent") or 0,
+        "topic": doc.get("topic"),
+        "xpEarned": doc.get("xpEarned") or 0,
+        "timestamp": doc.get("timestamp") or doc["_id"].generation_time.replace(tzinfo=None),
+    }
+
+def history_stats(user_id: str, exclude_answer_id: str) -> Tuple[Optional[Dict], List[str]]:
+    """Stats replayed from a user's stored answers (archive, then ``progress``) and the ids
+    of the latest of them; (None, []) without history."""
+    def events():
+        if archive_totals_collection.find_one({"userId": user_id}, {"_id": 1}) is not None:
+            from archive import to_records
+            columns = ["isCorrect", "timeSpent", "topic", "xpEarned"]
+            for frame in answer_archive().iter_user_months(user_id, columns=columns):
+                yield from map(stats_event, to_records(frame))
+        cursor = progress_collection.find(
+            {"userId": user_id, "_id": {"$ne": ObjectId(exclude_answer_id)}},
+            {"isCorrect": 1, "timeSpent": 1, "topic": 1, "xpEarned": 1, "timestamp": 1},
+        ).sort([("timestamp", 1), ("_id", 1)])
+        yield from map(stats_event, cursor)
+
+    recent: deque = deque(maxlen=RECENT_ANSWER_IDS)
+    def remember(history):
+        for event in history:
+            recent.append(event["answerId"])
+            yield event
+
+    stats = gamification.replay(remember(events()))
+    return (stats, list(recent)) if recent else (None, [])
+
+def update_user_stats(user_id: str, event: Dict, replicate_to_firestore: bool) -> Tuple[Dict, Optional[Dict]]:
+    """Fold an answer into the user's stats; returns the new stats and the engine's summary
+    (XP gained, streak bonus, new achievements, level-up), None if already applied."""
+    # Read-modify-write of the stats document must be atomic: answers from
+    # several devices can be processed concurrently by different workers.
+    # MongoDB: optimistic concurrency on a version counter
+    for _ in range(5):
+        current = user_stats_collection.find_one({"userId": user_id}, {"_id": 0, "userId": 0})
+        exists = current is not None
+        if not exists:
+            # First answer since the engine exists: start from the stored history, not from zero.
+            # Answers of that history saved meanwhile count as applied, so their jobs skip them
+            version = 0
+            current, applied = history_stats(user_id, event["answerId"])
+        else:
+            version = current.pop("version", 0)
+            applied = current.pop("appliedAnswers", [])
+        if event["answerId"] in applied:
+            # Retry of a job whose stats write went through: only replication is left
+            stats, summary = current, None
+            break
+        stats, summary = gamification.apply_answer(current, event)
+        version += 1
+        document = {**stats, "userId": user_id, "version": version,
+                    "appliedAnswers": (applied + [event["answerId"]])[-RECENT_ANSWER_IDS:]}
+        if not exists:
+            try:
+                user_stats_collection.insert_one(document)
+            except DuplicateKeyError:
+                continue
+        elif not user_stats_collection.update_one({"userId": user_id, "version": version - 1}, {"$set": document}).modified_count:
+            continue
+        break
+    else:
+        raise RuntimeError(f"Concurrent stats updates for {user_id}, giving up")
+    if replicate_to_firestore:
+        # Versioned: the replicator never writes an older stats version over a newer one
+        path = f"user_progress/{user_id}"
+        replicate(outbox_entry(path, stats, version=version, key=f"{path}@{version}"))
+    progress_cache.invalidate(user_id)
+    return stats, summary
+
+def record_answer(progress_data: Dict, event: Dict, signed_in: bool):
+    # Each step is idempotent, so a retry of the whole job is safe
+    save_progress(progress_data, signed_in)
+    if signed_in:
+        update_user_stats(progress_data["userId"], event, True)
+
+def preview_gamification(user_id: str, event: Dict) -> Optional[Dict]:
+    """The engine's summary for an answer, from the stored stats and without writing them.
+
+    One indexed read, up to two more before the user's first stats write. The queued job writes the
+    authoritative stats; an earlier answer still in the queue is missing from the preview
+    until the next progress read. None while the stats still have to be seeded from history.
+    """
+    current = user_stats_collection.find_one({"userId": user_id}, {"_id": 0, "userId": 0, "version": 0, "appliedAnswers": 0})
+    if current is None and (
+        progress_collection.find_one({"userId": user_id, "_id": {"$ne": ObjectId(event["answerId"])}}, {"_id": 1})
+        or archive_totals_collection.find_one({"userId": user_id}, {"_id": 1})
+    ):
+        return None
+    stats, summary = gamification.apply_answer(current, event)
+    return {**summary, "stats": stats}
+
+@app.post("/api/answer", dependencies=[Depends(admit("answer", get_optional_user))])
 async def submit_answer(
     answer: QuestionAnswer,
     language: Optional[str] = "de",
     user: Optional[Dict] = Depends(get_optional_user)
 ):
     try:
-        # Get the question
-        if firebase_db and user:
-            doc_ref = firebase_db.collection('questions').document(answer.questionId)
-            doc = doc_ref.get()
-            if doc.exists:
-                question = doc.to_dict()
-            else:
-                raise HTTPException(status_code=404, detail="Question not found")
-        else:
-            question = questions_collection.find_one({"id": answer.questionId}, {"_id": 0})
-            if not question:
-                raise HTTPException(status_code=404, detail="Question not found")
+        question = await find_question(answer.questionId)
+        if not question:
+            raise HTTPException(status_code=404, detail="Question not found")
         
         # Check if answer is correct
-        correct_answers = set(question["correctAnswer"])
-        user_answers = set(answer.selectedAnswers)
-        is_correct = correct_answers == user_answers
+        grade = grader.grade(question, language, answer.selectedAnswers, answer.textAnswer)
+        is_correct = grade.correct
         
-        # Calculate XP and streaks (gamification)
-        base_xp = 10 if is_correct else 2
-        streak_bonus = 0
-        
-        # Speed bonus
-        if answer.timeSpent < 10 and is_correct:
-            base_xp = int(base_xp * 1.2)
-        
-        # Difficulty bonus
-        if question.get("difficulty") == "hard" and is_correct:
-            base_xp = int(base_xp * 1.5)
+        # Per-answer XP; streak bonus and achievements are applied with the user's stats
+        xp = gamification.calculate_xp(is_correct, answer.timeSpent, question.get("difficulty"), answer.isFirstTry)
         
         # User ID for progress tracking
         user_id = user["uid"] if user else f"guest_{uuid.uuid4().hex[:8]}"
         
         # Update progress in Firestore or MongoDB
         progress_data = {
+            "_id": ObjectId(),
             "userId": user_id,
             "questionId": answer.questionId,
             "selectedAnswers": answer.selectedAnswers,
+            "textAnswer": answer.textAnswer,
             "correctAnswers": question["correctAnswer"],
             "isCorrect": is_correct,
+            "score": grade.score,
             "timeSpent": answer.timeSpent,
             "timestamp": datetime.utcnow(),
             "topic": question["topic"],
             "difficulty": question["difficulty"],
-            "xpEarned": base_xp + streak_bonus,
+            "xpEarned": xp["totalXP"],
             "isFirstTry": answer.isFirstTry
         }
+        event = stats_event(progress_data)
         
-        if firebase_db and user:
-            # Save to Firestore
-            progress_ref = firebase_db.collection('user_progress').document(user_id)
-            progress_ref.collection('answers').add(progress_data)
-        else:
-            # Save to MongoDB
-            progress_collection.insert_one(progress_data)
+        # The response carries the engine's result computed from the current stats without
+        # writing them; read before the job is queued, so the job cannot have applied it yet
+        summary = None
+        if user:
+            try:
+                summary = await asyncio.to_thread(preview_gamification, user_id, event)
+            except Exception as e:
+                logger.warning(f"Gamification preview for {user_id} failed: {e}")
+        # Persisting the answer and then folding it into the stats is one job off the request
+        # path, so the stats never count an answer that was not saved
+        await work_queue.submit("record_answer", record_answer, progress_data, event, bool(user))
         
         return {
             "correct": is_correct,
+            "score": grade.score,
             "correctAnswers": question["correctAnswer"],
             "explanation": question["explanation"].get(language, question["explanation"]["de"]),
-            "xpEarned": base_xp + streak_bonus,
-            "streakBonus": streak_bonus,
-            "timeSpent": answer.timeSpent
+            "xpEarned": xp["totalXP"],
+            "bonuses": xp["bonuses"],
+            "timeSpent": answer.timeSpent,
+            # Authoritative gamification result for signed-in users; None for guests
+            "gamification": summary
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error submitting answer: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit answer")
 
-@app.get("/api/topics")
-async def get_topics():
+@app.get("/api/topics", dependencies=[Depends(admit("catalog"))])
+async def get_topics(request: Request):
     try:
-        pipeline = [
-            {"$group": {
-                "_id": "$topic",
-                "count": {"$sum": 1},
-                "difficulties": {"$addToSet": "$difficulty"}
-            }},
-            {"$project": {
-                "topic": "$_id",
-                "totalQuestions": "$count",
-                "difficulties": "$difficulties",
-                "_id": 0
-            }},
-            {"$sort": {"topic": 1}}
-        ]
-        
-        topics = list(questions_collection.aggregate(pipeline))
-        return topics
+        if not catalog.loaded:
+            return topic_summary()
+        key = ("topics", catalog.version)
+        variants = precompressed.peek(key) or await asyncio.to_thread(
+            precompressed.get_or_build, key, topic_summary, levels=ON_DEMAND_COMPRESSION_LEVELS
+        )
+        return PrecompressedCache.response(request, variants)
         
     except Exception as e:
         logger.error(f"Error fetching topics: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch topics")
 
-@app.get("/api/user/progress")
+def answer_archive():
+    # pandas/pyarrow are only imported when the archive is actually used
+    from archive import AnswerArchive
+    return AnswerArchive(settings.archive_dir, settings.archive_buckets)
+
+def archive_old_answers(cutoff: datetime, batch_size: Optional[int] = None) -> Dict:
+    return answer_archive().archive(
+        progress_collection, archive_totals_collection, cutoff, batch_size or settings.archive_batch_size,
+        leases_collection,
+    )
+
+def archived_totals(user_id: str) -> Optional[Dict]:
+    pipeline = [
+        {"$match": {"userId": user_id}},
+        {"$group": {"_id": None, "totalAnswered": {"$sum": "$totalAnswered"},
+                    "correctAnswers": {"$sum": "$correctAnswers"}, "totalXP": {"$sum": "$totalXP"}}},
+        {"$project": {"_id": 0}},
+    ]
+    result = list(archive_totals_collection.aggregate(pipeline))
+    return result[0] if result else None
+
+def archived_topic_stats(user_id: str) -> Dict[str, Dict]:
+    from archive import to_records
+    frame = answer_archive().read_user(user_id, columns=["topic", "isCorrect"])
+    topics: Dict[str, Dict] = {}
+    for row in to_records(frame):
+        entry = topics.setdefault(row["topic"], {"answered": 0, "correct": 0})
+        entry["answered"] += 1
+        entry["correct"] += int(bool(row["isCorrect"]))
+    return topics
+
+def archived_history_batches(user_id: str, since: Optional[datetime], after: Optional[str] = None):
+    from archive import to_records
+    for frame in answer_archive().iter_user_months(user_id, since, after=after):
+        yield to_records(frame)
+
+# The /api/user/progress response; topicStats maps topic -> {answered, correct, accuracy}
+PROGRESS_FIELDS = (
+    "totalQuestionsAnswered", "correctAnswers", "overallAccuracy", "totalXP", "currentLevel",
+    "currentStreak", "longestStreak", "studyDaysStreak", "topicStats", "achievements", "badges",
+    "favoriteQuestions", "difficultQuestions", "dailyGoal", "weeklyGoal", "lastStudyDate",
+)
+
+def progress_response(stats: Dict) -> Dict:
+    """Engine stats or aggregated counters in the documented response shape; internal
+    counters are dropped, missing fields take their defaults."""
+    stats = {**default_stats(), **stats}
+    answered = stats["totalQuestionsAnswered"]
+    stats["overallAccuracy"] = round(stats["correctAnswers"] / answered * 100, 1) if answered else 0
+    stats["currentLevel"] = gamification.calculate_level(stats["totalXP"])
+    stats["topicStats"] = {
+        topic: {"answered": entry["answered"], "correct": entry["correct"],
+                "accuracy": round(entry["correct"] / entry["answered"] * 100, 1) if entry["answered"] else 0}
+        for topic, entry in stats["topicStats"].items()
+    }
+    return {field: stats[field] for field in PROGRESS_FIELDS}
+
+async def load_user_progress(user_id: str) -> Dict:
+    # Read from the Mongo primary, never from the Firestore copy: replication is asynchronous,
+    # so a value read there right after an answer could be cached although already stale
+    stats = user_stats_collection.find_one({"userId": user_id}, {"_id": 0, "userId": 0, "version": 0, "appliedAnswers": 0})
+    if stats:
+        return progress_response(stats)
+    # No engine state yet (answers from before the stats collection): aggregate the answers per topic
+    pipeline = [
+        {"$match": {"userId": user_id}},
+        {"$group": {
+            "_id": "$topic",
+            "answered": {"$sum": 1},
+            "correct": {"$sum": {"$cond": ["$isCorrect", 1, 0]}},
+            "xp": {"$sum": "$xpEarned"},
+        }}
+    ]
+    topics: Dict[str, Dict] = {}
+    totals = {"totalQuestionsAnswered": 0, "correctAnswers": 0, "totalXP": 0}
+    for group in progress_collection.aggregate(pipeline):
+        totals["totalQuestionsAnswered"] += group["answered"]
+        totals["correctAnswers"] += group["correct"]
+        totals["totalXP"] += group["xp"]
+        if group["_id"]:
+            topics[group["_id"]] = {"answered": group["answered"], "correct": group["correct"]}
+    # Answers moved to cold storage: counters stay live, the per-topic numbers come from the archive
+    archived = archived_totals(user_id)
+    if archived:
+        totals["totalQuestionsAnswered"] += archived["totalAnswered"]
+        totals["correctAnswers"] += archived["correctAnswers"]
+        totals["totalXP"] += archived["totalXP"]
+        for topic, entry in (await asyncio.to_thread(archived_topic_stats, user_id)).items():
+            if topic:
+                current = topics.setdefault(topic, {"answered": 0, "correct": 0})
+                current["answered"] += entry["answered"]
+                current["correct"] += entry["correct"]
+    return progress_response({**totals, "topicStats": topics})
+
+@app.get("/api/user/progress", dependencies=[Depends(admit("progress", get_current_user))])
 async def get_user_progress(user: Dict = Depends(get_current_user)):
+    """Counters, accuracy, level, streaks, achievements, badges and per-topic stats
+    (``PROGRESS_FIELDS``), the same shape for every user"""
     try:
         user_id = user["uid"]
-        
-        if firebase_db:
-            # Get from Firestore
-            progress_ref = firebase_db.collection('user_progress').document(user_id)
-            doc = progress_ref.get()
-            
-            if doc.exists:
-                return doc.to_dict()
-            else:
-                # Initialize user progress
-                initial_progress = {
-                    "totalXP": 0,
-                    "currentLevel": 1,
-                    "totalQuestionsAnswered": 0,
-                    "correctAnswers": 0,
-                    "currentStreak": 0,
-                    "longestStreak": 0,
-                    "achievements": [],
-                    "badges": [],
-                    "favoriteQuestions": [],
-                    "difficultQuestions": [],
-                    "dailyGoal": 20,
-                    "weeklyGoal": 140,
-                    "lastStudyDate": None
-                }
-                progress_ref.set(initial_progress)
-                return initial_progress
-        else:
-            # Fallback to MongoDB aggregation
-            pipeline = [
-                {"$match": {"userId": user_id}},
-                {"$group": {
-                    "_id": None,
-                    "totalAnswered": {"$sum": 1},
-                    "correctAnswers": {"$sum": {"$cond": ["$isCorrect", 1, 0]}},
-                    "totalXP": {"$sum": "$xpEarned"},
-                    "topicStats": {"$push": {
-                        "topic": "$topic",
-                        "correct": "$isCorrect",
-                        "timeSpent": "$timeSpent"
-                    }}
-                }}
-            ]
-            
-            result = list(progress_collection.aggregate(pipeline))
-            if result:
-                stats = result[0]
-                return {
-                    "totalQuestionsAnswered": stats["totalAnswered"],
-                    "correctAnswers": stats["correctAnswers"],
-                    "totalXP": stats.get("totalXP", 0),
-                    "overallAccuracy": (stats["correctAnswers"] / stats["totalAnswered"] * 100) if stats["totalAnswered"] > 0 else 0,
-                    "currentLevel": max(1, int((stats.get("totalXP", 0) / 100) ** 0.5)),
-                    "topicStats": stats["topicStats"]
-                }
-            else:
-                return {"totalQuestionsAnswered": 0, "correctAnswers": 0, "totalXP": 0}
-                
+        # Bursts of identical requests share one read; submitting an answer invalidates the entry
+        return await progress_cache.get(user_id, lambda: load_user_progress(user_id))
     except Exception as e:
         logger.error(f"Error fetching user progress: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch user progress")
 
-@app.get("/api/spaced-repetition")
+@app.get("/api/user/history/export", dependencies=[Depends(admit("progress", get_current_user))])
+async def export_user_history(
+    format: str = "ndjson",
+    since: Optional[datetime] = None,
+    after: Optional[str] = None,
+    gzip: bool = False,
+    user_id: Optional[str] = None,
+    user: Dict = Depends(get_current_user)
+):
+    """Stream the complete answer history (archived and live) as NDJSON or CSV, oldest first.
+
+    An interrupted export resumes with ``since`` and ``after`` set to the timestamp
+    and answerId of the last record received. Admins (support) may export another user's history via ``user_id``.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if user_id and user_id != user["uid"] and not is_admin(user):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    user_id = user_id or user["uid"]
+    if after is not None and (since is None or not ObjectId.is_valid(after)):
+        raise HTTPException(status_code=400, detail="after must be an answerId and requires since")
+    if after is not None:
+        after = str(ObjectId(after))  # lowercase hex, as stored in the archive
+    if since is not None and since.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    try:
+        has_archive = archive_totals_collection.find_one({"userId": user_id}, {"_id": 1}) is not None
+        archived = (lambda: archived_history_batches(user_id, since, after)) if has_archive else None
+        batches = iter_history(progress_collection, user_id, since, settings.export_batch_size, archived, after)
+    except Exception as e:
+        logger.error(f"Error exporting history for {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to export history")
+
+    filename = f"answer-history.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_chunks(batches, format, gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/user/daily-plan", dependencies=[Depends(admit("progress", get_current_user))])
+async def get_daily_plan(user: Dict = Depends(get_current_user)):
+    """Today's review plan and daily challenge, precomputed by the nightly job"""
+    try:
+        user_id = user["uid"]
+        today = local_date(datetime.utcnow(), settings.plan_timezone)
+        plan = daily_plans_collection.find_one({"userId": user_id, "date": today.isoformat()}, {"_id": 0})
+        if plan:
+            return plan
+        # Not covered by last night's run (new or returning user): compute once and keep it for today.
+        # Insert-only, so a plan stored by the nightly job in the meantime is never replaced
+        plan = await asyncio.to_thread(compute_user_plan, get_mongo_db(), user_id, today, settings.plan_timezone, settings.plan_size)
+        try:
+            daily_plans_collection.update_one({"userId": user_id, "date": plan["date"]}, {"$setOnInsert": plan}, upsert=True)
+        except DuplicateKeyError:
+            pass
+        plan.pop("_id", None)
+        return plan
+    except Exception as e:
+        logger.error(f"Error fetching daily plan: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch daily plan")
+
+@app.get("/api/spaced-repetition", dependencies=[Depends(admit("progress", get_current_user))])
 async def get_spaced_repetition_questions(
     limit: int = 20,
     user: Dict = Depends(get_current_user)
@@ -615,6 +1315,176 @@ async def get_spaced_repetition_questions(
         logger.error(f"Error fetching spaced repetition questions: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch spaced repetition questions")
 
+def iter_file_range(path, start: int, end: int, chunk_size: int = 64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@app.get("/api/assets/{name}")
+async def get_asset(name: str, request: Request):
+    path = asset_store.path_for(name)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    # Names are content hashes, so the ETag never changes and clients may cache forever
+    etag = f'"{name.rsplit(".", 1)[0]}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": etag, "Accept-Ranges": "bytes", **ASSET_SECURITY_HEADERS}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    media_type = MEDIA_TYPES[name.rsplit(".", 1)[1]]
+    size = path.stat().st_size
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", **ASSET_SECURITY_HEADERS})
+
+    if byte_range is None:
+        # FileResponse uses the ASGI pathsend extension (zero-copy sendfile) where the server supports it
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(iter_file_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+@app.post("/api/admin/questions/{question_id}/image")
+async def upload_question_image(
+    question_id: str,
+    file: UploadFile = File(...),
+    admin: Dict = Depends(get_admin_user)
+):
+    try:
+        data = await file.read()
+        try:
+            image_fields = await asyncio.to_thread(asset_store.put_image, data)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        result = questions_collection.update_one({"id": question_id}, {"$set": image_fields})
+        if not result.matched_count:
+            raise HTTPException(status_code=404, detail="Question not found")
+        catalog.update(question_id, image_fields)
+        await asyncio.to_thread(bump_catalog_revision)
+        replicate(outbox_entry(f"questions/{question_id}", image_fields, op="merge"))
+        return {"id": question_id, **image_fields}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading image for question {question_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to upload image")
+
+@app.post("/api/admin/questions/import")
+async def import_question_bank(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    chunk_size: int = 500,
+    dry_run: bool = False,
+    admin: Dict = Depends(get_admin_user)
+):
+    """Stream-import a JSON/NDJSON/CSV question bank; bad rows are reported, not fatal.
+
+    An unreadable stream (e.g. malformed JSON) answers 400 with the partial report.
+    """
+    from importer import FORMATS, detect_format, open_text, run_import
+    try:
+        fmt = format or detect_format(file.filename)
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}'")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Uploaded banks cannot reference files on the server, so image paths are not resolved
+        report = await asyncio.to_thread(
+            run_import, open_text(file.file), fmt, Question, write_question_chunk, chunk_size, None, dry_run
+        )
+        if report["imported"] and not dry_run:
+            await asyncio.to_thread(load_catalog)
+        if report.get("aborted"):
+            return JSONResponse(status_code=400, content={"detail": report["aborted"], "report": report})
+        return report
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing question bank: {e}")
+        raise HTTPException(status_code=500, detail="Failed to import question bank")
+
+@app.post("/api/admin/archive")
+async def archive_answers(
+    months: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    admin: Dict = Depends(get_admin_user)
+):
+    """Move answers older than ``months`` (default ARCHIVE_AFTER_MONTHS) to cold storage"""
+    months = months or settings.archive_after_months
+    if months < 1:
+        raise HTTPException(status_code=400, detail="months must be at least 1")
+    from archive import ArchiveBusy
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=30 * months)
+        return await asyncio.to_thread(archive_old_answers, cutoff, batch_size)
+    except ArchiveBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error archiving answers: {e}")
+        raise HTTPException(status_code=500, detail="Failed to archive answers")
+
+@app.get("/api/admin/profiles")
+async def get_profiles(limit: int = 50, admin: Dict = Depends(get_admin_user)):
+    """Recent request profiles, newest first"""
+    return await asyncio.to_thread(list_profiles, PROFILES_DIR, limit)
+
+@app.get("/api/admin/profiles/{name}")
+async def get_profile_stacks(name: str, admin: Dict = Depends(get_admin_user)):
+    """Folded stacks of one profile (input for flamegraph.pl / speedscope)"""
+    path = PROFILES_DIR / f"{name}.folded"
+    if not PROFILE_NAME.match(name) or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
+@app.get("/api/admin/analytics")
+async def get_cohort_analytics(
+    since_days: Optional[int] = None,
+    limit: int = 100,
+    refresh: bool = False,
+    admin: Dict = Depends(get_admin_user)
+):
+    """Topic accuracy distributions, time percentiles, pass probabilities and retention"""
+    try:
+        # pandas/numpy are only imported when analytics are actually requested
+        from analytics import compute_cohort_analytics, get_cache, load_progress_frame
+        analytics_cache = get_cache(settings.analytics_cache_ttl)
+        cache_key = (since_days, limit)
+        if not refresh:
+            cached = analytics_cache.get(cache_key)
+            if cached:
+                return cached
+
+        match = {}
+        if since_days:
+            match["timestamp"] = {"$gte": datetime.utcnow() - timedelta(days=since_days)}
+
+        def compute():
+            frame = load_progress_frame(progress_collection, match, settings.analytics_batch_size)
+            return compute_cohort_analytics(frame, limit)
+
+        # CPU-bound; keep the event loop free
+        result = await asyncio.to_thread(compute)
+        result["generatedAt"] = datetime.utcnow().isoformat()
+        analytics_cache.set(cache_key, result)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error computing analytics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute analytics")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Offline spaced-repetition policy simulator.
+
+Simulates thousands of synthetic learners over months with an
+exponential forgetting curve, vectorized over (learner, question) with
+NumPy. Compares scheduling policies by retention against review load, so
+the Leitner intervals in frontend/src/services/SpacedRepetition.js can be
+tuned from data instead of guessed.
+
+Memory model per (learner, question):
+    recall probability  R = exp(-elapsed_days / stability)
+    successful review   stability *= 1 + growth * (1 - R)   (spacing effect)
+    failed review       stability *= lapse_factor
+
+Usage:
+    python srs_simulator.py --learners 5000 --questions 300 --days 120
+    python srs_simulator.py --policies leitner,leitner:1-2-4-8-16-32,retention:0.85 --json
+"""
+
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Current app schedule (SpacedRepetition.js boxes 1..6)
+LEITNER_INTERVALS = (1, 3, 7, 14, 30, 90)
+NEVER = np.inf
+
+
+@dataclass
+class SimulationConfig:
+    learners: int = 2000
+    questions: int = 300
+    days: int = 120
+    new_per_day: int = 10
+    daily_capacity: int = 150  # reviews a learner does per day at most
+    initial_stability: float = 2.0  # days, median over learners
+    ability_sigma: float = 0.4  # log-normal spread of learner ability
+    difficulty_sigma: float = 0.5  # log-normal spread of question difficulty
+    growth: float = 5.0
+    lapse_factor: float = 0.5
+    seed: int = 7
+
+
+class Policy:
+    name = "policy"
+
+    def reset(self, shape):
+        pass
+
+    def priority(self, day: int, due: np.ndarray, last_review: np.ndarray) -> np.ndarray:
+        """Lower is reviewed first when more items are due than the learner has time for."""
+        # Longest-waiting first
+        return np.where(due, last_review - day, NEVER)
+
+    def schedule(self, day: int, reviewed: np.ndarray, success: np.ndarray, stability: np.ndarray) -> np.ndarray:
+        """Next due day for the reviewed items (same shape as their mask selection)."""
+        raise NotImplementedError
+
+
+class LeitnerPolicy(Policy):
+    """Box system as in SpacedRepetition.js: correct -> next box, wrong -> box 1."""
+
+    def __init__(self, intervals: Sequence[int] = LEITNER_INTERVALS):
+        self.intervals = np.asarray(intervals, dtype=float)
+        self.name = "leitner:" + "-".join(str(i) for i in intervals)
+
+    def reset(self, shape):
+        self.box = np.zeros(shape, dtype=np.int8)  # 0-based box index
+
+    def priority(self, day, due, last_review):
+        # calculatePriority(): lower box first, items unseen for > 30 days jump the queue
+        overdue_bonus = np.where(day - last_review > 30, -10, 0)
+        return np.where(due, self.box + 1 + overdue_bonus, NEVER)
+
+    def schedule(self, day, reviewed, success, stability):
+        last_box = len(self.intervals) - 1
+        box = self.box[reviewed]
+        box = np.where(success, np.minimum(box + 1, last_box), 0)
+        self.box[reviewed] = box
+        return day + self.intervals[box]
+
+
+class FixedIntervalPolicy(Policy):
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.name = f"fixed:{interval}"
+
+    def schedule(self, day, reviewed, success, stability):
+        # Failed items come back the next day
+        return day + np.where(success, self.interval, 1).astype(float)
+
+
+class TargetRetentionPolicy(Policy):
+    """Review when predicted recall drops to ``target``.
+
+    Uses the model's own stability, so it is an upper bound for what a
+    fitted scheduler (e.g. per-user stability estimates) could reach.
+    """
+
+    def __init__(self, target: float):
+        self.target = target
+        self.name = f"retention:{target:g}"
+
+    def schedule(self, day, reviewed, success, stability):
+        interval = np.maximum(1.0, np.round(-stability * np.log(self.target)))
+        return day + interval
+
+
+def parse_policy(spec: str) -> Policy:
+    kind, _, arg = spec.partition(":")
+    if kind == "leitner":
+        return LeitnerPolicy([int(i) for i in arg.split("-")] if arg else LEITNER_INTERVALS)
+    if kind == "fixed":
+        return FixedIntervalPolicy(int(arg or 7))
+    if kind == "retention":
+        return TargetRetentionPolicy(float(arg or 0.9))
+    raise ValueError(f"Unknown policy '{spec}' (leitner[:i-j-k], fixed:<days>, retention:<target>)")
+
+
+def simulate(policy: Policy, config: SimulationConfig) -> Dict[str, float]:
+    rng = np.random.default_rng(config.seed)
+    shape = (config.learners, config.questions)
+
+    # Same learners and questions for every policy (seeded)
+    ability = rng.lognormal(0.0, config.ability_sigma, size=(config.learners, 1))
+    difficulty = rng.lognormal(0.0, config.difficulty_sigma, size=(1, config.questions))
+    stability = np.broadcast_to(config.initial_stability * ability / difficulty, shape).copy()
+
+    introduced = np.zeros(shape, dtype=bool)
+    last_review = np.zeros(shape)
+    due_day = np.full(shape, NEVER)
+    policy.reset(shape)
+
+    reviews_per_day = np.zeros((config.days, config.learners))
+    retention_per_day = np.zeros(config.days)
+    rows = np.arange(config.learners)[:, None]
+
+    for day in range(config.days):
+        # Introduce new questions in catalog order
+        first_new = min(day * config.new_per_day, config.questions)
+        last_new = min(first_new + config.new_per_day, config.questions)
+        if first_new < last_new:
+            introduced[:, first_new:last_new] = True
+            last_review[:, first_new:last_new] = day
+            due_day[:, first_new:last_new] = day  # first exposure counts as a review today
+
+        due = introduced & (due_day <= day)
+        # Cap reviews per learner by policy priority
+        priority = policy.priority(day, due, last_review)
+        order = np.argsort(priority, axis=1, kind="stable")[:, :config.daily_capacity]
+        chosen = np.zeros(shape, dtype=bool)
+        chosen[rows, order] = True
+        reviewed = chosen & due
+
+        recall = np.exp(-(day - last_review[reviewed]) / stability[reviewed])
+        success = rng.random(recall.shape) < recall
+        s = stability[reviewed]
+        stability[reviewed] = np.where(success, s * (1 + config.growth * (1 - recall)), s * config.lapse_factor)
+        stability[reviewed] = np.maximum(stability[reviewed], 0.1)
+        last_review[reviewed] = day
+        due_day[reviewed] = policy.schedule(day, reviewed, success, stability[reviewed])
+
+        reviews_per_day[day] = reviewed.sum(axis=1)
+        # End-of-day expected recall over everything introduced so far
+        elapsed = np.where(introduced, day + 1 - last_review, 0)
+        retention_per_day[day] = np.exp(-elapsed / stability)[introduced].mean() if introduced.any() else 0.0
+
+    final_elapsed = np.where(introduced, config.days - last_review, 0)
+    final_recall = np.where(introduced, np.exp(-final_elapsed / stability), 0.0)
+    load = reviews_per_day.mean(axis=0)
+    return {
+        "policy": policy.name,
+        "meanRetention": round(float(retention_per_day.mean()), 4),
+        "finalRetention": round(float(final_recall.sum(axis=1).mean() / config.questions), 4),
+        "reviewsPerLearnerDay": round(float(load.mean()), 2),
+        "peakReviewsPerDay": round(float(reviews_per_day.sum(axis=1).max() / config.learners), 2),
+        "p95LearnerLoad": round(float(np.percentile(load, 95)), 2),
+        "capacitySaturatedDays": int((reviews_per_day.mean(axis=1) >= config.daily_capacity * 0.99).sum()),
+        # Retention gained per review: the number to maximize for a fixed server budget
+        "retentionPerReview": round(float(final_recall.sum(axis=1).mean() / max(1.0, reviews_per_day.sum(axis=0).mean())), 5),
+    }
+
+
+def compare(policies: List[Policy], config: SimulationConfig) -> List[Dict[str, float]]:
+    results = []
+    for policy in policies:
+        started = time.perf_counter()
+        result = simulate(policy, config)
+        result["seconds"] = round(time.perf_counter() - started, 2)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policies", default="leitner,leitner:1-2-4-8-16-32,leitner:1-3-7-21-60-120,retention:0.9,retention:0.8")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    for field, default in SimulationConfig.__dataclass_fields__.items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default.default), default=default.default)
+    args = parser.parse_args()
+
+    config = SimulationConfig(**{field: getattr(args, field) for field in SimulationConfig.__dataclass_fields__})
+    results = compare([parse_policy(spec) for spec in args.policies.split(",")], config)
+
+    if args.json:
+        print(json.dumps({"config": config.__dict__, "results": results}, indent=2))
+        return
+    columns = ["policy", "meanRetention", "finalRetention", "reviewsPerLearnerDay", "p95LearnerLoad",
+               "peakReviewsPerDay", "retentionPerReview", "seconds"]
+    print(f"{config.learners} learners x {config.questions} questions over {config.days} days")
+    print("  ".join(f"{c:>22}" for c in columns))
+    for result in results:
+        print("  ".join(f"{result[c]:>22}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 const CACHE_NAME = 'ihk-taxi-v1.0.0';
 const STATIC_CACHE = `${CACHE_NAME}-static`;
 const DATA_CACHE = `${CACHE_NAME}-data`;
+// Content-addressed question images never change, so this cache is kept across versions
+const ASSET_CACHE = 'ihk-taxi-assets';
 
 // URLs to cache for offline functionality
 const FILES_TO_CACHE = [
@@ -36,7 +38,7 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames.map((thisCacheName) => {
-          if (thisCacheName !== STATIC_CACHE && thisCacheName !== DATA_CACHE) {
+          if (thisCacheName !== STATIC_CACHE && thisCacheName !== DATA_CACHE && thisCacheName !== ASSET_CACHE) {
             console.log('[SW] Removing old cache', thisCacheName);
             return caches.delete(thisCacheName);
           }
@@ -49,6 +51,23 @@ self.addEventListener('activate', (event) => {
 
 // Fetch event handler
 self.addEventListener('fetch', (event) => {
+  if (event.request.url.includes('/api/assets/')) {
+    // Immutable assets - cache first, cached permanently
+    event.respondWith(
+      caches.open(ASSET_CACHE).then((cache) => {
+        return cache.match(event.request).then((cached) => {
+          return cached || fetch(event.request).then((response) => {
+            if (response.status === 200) {
+              cache.put(event.request, response.clone());
+            }
+            return response;
+          });
+        });
+      })
+    );
+    return;
+  }
+
   if (event.request.url.includes('/api/')) {
     // API requests - cache with network first strategy
     event.respondWith(
@@ -17,6 +17,7 @@ import { useLanguage } from '../contexts/LanguageContext';
 import QuestionCard from './QuestionCard';
 import SpacedRepetitionSystem from '../services/SpacedRepetition';
 import GamificationService from '../services/GameificationService';
+import { checkGuestResponse, guestHeaders } from '../services/GuestSession';
 import { questionBank, topicConfig } from '../data/questionBank';
 import toast from 'react-hot-toast';
 
@@ -53,6 +54,14 @@ const MainApp = () => {
   const [spacedRepetition] = useState(new SpacedRepetitionSystem());
   const [gamification] = useState(new GamificationService());
 
+  // Signed-in users authenticate; guests identify with a server-issued guest id
+  const requestHeaders = async () => {
+    if (user?.accessToken) {
+      return { 'Authorization': `Bearer ${user.accessToken}` };
+    }
+    return guestHeaders(API_BASE_URL);
+  };
+
   // Initialize data
   useEffect(() => {
     loadInitialData();
@@ -83,7 +92,7 @@ const MainApp = () => {
 
   const fetchTopics = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/topics`);
+      const response = checkGuestResponse(await fetch(`${API_BASE_URL}/api/topics`, { headers: await requestHeaders() }));
       if (response.ok) {
         const data = await response.json();
         setTopics(data);
@@ -142,11 +151,11 @@ const MainApp = () => {
     }
   };
 
-  const checkDailyChallenge = () => {
+  const checkDailyChallenge = async () => {
     try {
-      const today = new Date().toISOString().split('T')[0];
+      const today = gamification.planDate();
       const savedChallenge = localStorage.getItem('dailyChallenge');
-      
+
       if (savedChallenge) {
         const challenge = JSON.parse(savedChallenge);
         if (challenge.date === today) {
@@ -154,7 +163,20 @@ const MainApp = () => {
           return;
         }
       }
-      
+
+      // Signed-in users get the plan precomputed by the nightly job (one document read)
+      if (user?.uid && user.uid !== 'guest' && user.accessToken) {
+        const response = await fetch(`${API_BASE_URL}/api/user/daily-plan`, {
+          headers: { 'Authorization': `Bearer ${user.accessToken}` }
+        });
+        if (response.ok) {
+          const plan = await response.json();
+          localStorage.setItem('dailyChallenge', JSON.stringify(plan.challenge));
+          setDailyChallenge(plan.challenge);
+          return;
+        }
+      }
+
       // Generate new daily challenge
       const newChallenge = gamification.generateDailyChallenge(userStats);
       localStorage.setItem('dailyChallenge', JSON.stringify(newChallenge));
@@ -184,7 +206,7 @@ const MainApp = () => {
           url = `${API_BASE_URL}/api/random-question?${params}`;
       }
 
-      const response = await fetch(url);
+      const response = checkGuestResponse(await fetch(url, { headers: await requestHeaders() }));
       if (response.ok) {
         const data = await response.json();
         
@@ -229,14 +251,14 @@ const MainApp = () => {
     setLoading(true);
     try {
       // Submit answer to backend
-      const response = await fetch(`${API_BASE_URL}/api/answer`, {
+      const response = checkGuestResponse(await fetch(`${API_BASE_URL}/api/answer`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          ...(user?.accessToken && { 'Authorization': `Bearer ${user.accessToken}` })
+          ...(await requestHeaders())
         },
         body: JSON.stringify(answerData)
-      });
+      }));
 
       let result;
       if (response.ok) {
@@ -264,14 +286,22 @@ const MainApp = () => {
       // Update local progress and stats
       await updateLocalProgress(answerData, result);
       
-      // Check for achievements
-      const newAchievements = gamification.checkAchievements(userStats, achievements);
+      // Achievements: the server's result for signed-in users, the local check otherwise
+      const newAchievements = result.gamification
+        ? result.gamification.newAchievements
+        : gamification.checkAchievements(userStats, achievements);
+      if (result.gamification?.levelUp) {
+        toast.success(`⭐ Level ${gamification.calculateLevel(result.gamification.stats.totalXP).currentLevel} erreicht!`);
+      }
       if (newAchievements.length > 0) {
         setAchievements([...achievements, ...newAchievements.map(a => a.id)]);
         newAchievements.forEach(achievement => {
           toast.success(`🏆 ${achievement.name} erreicht!`);
         });
       }
+      (result.gamification?.newBadges || []).forEach(badge => {
+        toast.success(`${badge.icon} Badge: ${badge.name}`);
+      });
 
       // Update daily challenge progress
       updateDailyChallengeProgress(result);
@@ -286,7 +316,9 @@ const MainApp = () => {
 
   const updateLocalProgress = async (answerData, result) => {
     try {
-      const newStats = {
+      // Signed-in users get their stats from the server's gamification engine; the local
+      // computation is only the fallback for guests and offline answers
+      const newStats = result.gamification ? { ...userStats, ...result.gamification.stats } : {
         ...userStats,
         totalQuestionsAnswered: userStats.totalQuestionsAnswered + 1,
         correctAnswers: userStats.correctAnswers + (result.correct ? 1 : 0),
@@ -210,6 +210,10 @@ const QuestionCard = ({
           <div className="mt-4">
             <img 
               src={question.image} 
+              srcSet={Object.entries(question.imageVariants || {})
+                .map(([width, url]) => `${url} ${width}w`)
+                .join(', ') || undefined}
+              sizes="(max-width: 640px) 100vw, 640px"
               alt="Question illustration"
               className="max-w-full h-auto rounded-lg"
             />
@@ -1,4 +1,7 @@
 // Gamification Service for IHK Taxi App
+// Same as the backend's PLAN_TIMEZONE: daily challenges roll over at local midnight there
+const PLAN_TIMEZONE = 'Europe/Berlin';
+
 class GamificationService {
   constructor() {
     this.xpPerCorrectAnswer = 10;
@@ -344,19 +347,26 @@ class GamificationService {
 
     // Select challenge based on user's weaknesses
     const userLevel = this.calculateLevel(userStats.totalXP || 0).currentLevel;
-    const dayOfYear = Math.floor((date - new Date(date.getFullYear(), 0, 0)) / (1000 * 60 * 60 * 24));
+    const day = this.planDate(date);
+    const [year, month, dayOfMonth] = day.split('-').map(Number);
+    const dayOfYear = (Date.UTC(year, month - 1, dayOfMonth) - Date.UTC(year, 0, 0)) / (1000 * 60 * 60 * 24);
     const challengeIndex = (dayOfYear + userLevel) % challenges.length;
 
     const selectedChallenge = challenges[challengeIndex];
     return {
       ...selectedChallenge,
-      date: date.toISOString().split('T')[0],
+      date: day,
       progress: 0,
       completed: false
     };
   }
 
   // Helper methods
+  planDate(date = new Date()) {
+    // YYYY-MM-DD in PLAN_TIMEZONE, the day the server's daily plans are keyed by
+    return date.toLocaleDateString('en-CA', { timeZone: PLAN_TIMEZONE });
+  }
+
   isToday(date) {
     const today = new Date();
     const checkDate = new Date(date);
@@ -0,0 +1,32 @@
+// Server-issued guest id, sent as X-Guest-Id so each guest gets its own rate limit
+// instead of sharing one with everybody behind the same address
+const STORAGE_KEY = 'guestId';
+
+let pending = null;
+
+export const guestHeaders = async (apiBaseUrl) => {
+  let guestId = localStorage.getItem(STORAGE_KEY);
+  if (!guestId) {
+    pending = pending || fetch(`${apiBaseUrl}/api/guest-id`, { method: 'POST' })
+      .then(response => (response.ok ? response.json() : null))
+      .then(data => {
+        if (data?.guestId) {
+          localStorage.setItem(STORAGE_KEY, data.guestId);
+        }
+        return data?.guestId || null;
+      })
+      .catch(() => null)
+      .finally(() => { pending = null; });
+    guestId = await pending;
+  }
+  return guestId ? { 'X-Guest-Id': guestId } : {};
+};
+
+// The server flags an id it cannot verify (e.g. signed with a key it no longer has):
+// forget it, so the next request fetches a new one
+export const checkGuestResponse = (response) => {
+  if (response.headers.get('X-Guest-Id-Rejected')) {
+    localStorage.removeItem(STORAGE_KEY);
+  }
+  return response;
+};
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from gamification import GamificationEngine
+
+engine = GamificationEngine(tz="Europe/Berlin")
+
+
+def answer(timestamp, correct=True, topic="Recht"):
+    return {"isCorrect": correct, "timeSpent": 20, "topic": topic, "xpEarned": 10, "timestamp": timestamp}
+
+
+def test_first_answer_unlocks_first_achievements():
+    stats, summary = engine.apply_answer(None, answer(datetime(2024, 5, 2, 12), topic=None))
+    assert {a["id"] for a in summary["newAchievements"]} == {"first_question", "first_correct"}
+    assert stats["totalQuestionsAnswered"] == 1
+    assert summary["xpGained"] == 10 + 50 + 100
+
+
+def test_replay_does_not_unlock_achievements_again():
+    start = datetime(2024, 5, 1, 12)
+    stats = engine.replay(answer(start + timedelta(minutes=i)) for i in range(120))
+    assert stats["totalQuestionsAnswered"] == 120
+    _, summary = engine.apply_answer(stats, answer(start + timedelta(hours=3)))
+    assert summary["newAchievements"] == []
+
+
+def test_badge_earned_once_per_local_day():
+    # 05:30 UTC is 07:30 in Berlin (summer time): early bird
+    stats, summary = engine.apply_answer(None, answer(datetime(2024, 5, 2, 5, 30)))
+    assert [badge["id"] for badge in summary["newBadges"]] == ["early_bird"]
+    stats, summary = engine.apply_answer(stats, answer(datetime(2024, 5, 2, 5, 40)))
+    assert summary["newBadges"] == []
+    stats, summary = engine.apply_answer(stats, answer(datetime(2024, 5, 3, 5, 30)))
+    assert [badge["id"] for badge in summary["newBadges"]] == ["early_bird"]
+    assert stats["badges"] == [{**summary["newBadges"][0], "earnedDate": "2024-05-03", "count": 2}]
+
+
+def test_badges_use_local_time():
+    # 21:30 UTC on Saturday is 23:30 in Berlin: night owl and weekend
+    _, summary = engine.apply_answer(None, answer(datetime(2024, 5, 4, 21, 30)))
+    assert {badge["id"] for badge in summary["newBadges"]} == {"night_owl", "weekend_warrior"}
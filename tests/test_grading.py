@@ -0,0 +1,40 @@
+import pytest
+
+from grading import NumericMatcher, parse_numbers
+
+
+@pytest.mark.parametrize("text, expected", [
+    # German: dot thousands, comma decimals
+    ("7.500.000 Euro", [7_500_000]),
+    ("1.234,56", [1234.56]),
+    ("7,5 Millionen", [7_500_000]),
+    # English: comma thousands, dot decimals
+    ("7,500,000 euros", [7_500_000]),
+    ("1,234.56", [1234.56]),
+    ("7,500,000.25", [7_500_000.25]),
+    ("7.5 million", [7_500_000]),
+    # Space groups, plain numbers
+    ("5 000 Euro", [5000]),
+    ("1 234,5", [1234.5]),
+    ("zwischen 25 und 50 km/h", [25, 50]),
+    # Decimals that cannot be thousands groups
+    ("7,5000", [7.5]),
+    ("1234,567", [1234.567]),
+    ("0,500", [0.5]),
+])
+def test_parse_numbers(text, expected):
+    assert parse_numbers(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", ["7,500", "7.500"])
+def test_single_three_digit_group_is_ambiguous(text):
+    assert sorted(parse_numbers(text)) == pytest.approx([7.5, 7500])
+
+
+@pytest.mark.parametrize("answer", ["7,500,000 euros", "7.500.000 €", "7,5 Mio", "7.5 million"])
+def test_numeric_matcher_accepts_both_notations(answer):
+    assert NumericMatcher(7_500_000, 0.0, False).grade([], answer).correct
+
+
+def test_numeric_matcher_rejects_other_values():
+    assert not NumericMatcher(7_500_000, 0.0, False).grade([], "7,500 euros").correct
@@ -0,0 +1,110 @@
+import io
+import json
+from typing import Any, Dict, List, Optional
+
+import pytest
+from pydantic import BaseModel
+
+import importer
+from importer import RowError, csv_to_question, import_stream, iter_csv, iter_json_array
+
+
+class Question(BaseModel):
+    # Same fields as server.Question
+    id: str
+    question: Dict[str, str]
+    type: str
+    options: Dict[str, List[str]]
+    correctAnswer: List[int]
+    explanation: Dict[str, str]
+    topic: str
+    difficulty: str = "medium"
+    tags: List[str] = []
+    image: Optional[str] = None
+    imageVariants: Dict[str, str] = {}
+    answerKey: Optional[Dict[str, Dict[str, Any]]] = None
+    partialCredit: bool = False
+
+
+def question(question_id: str, text: str = "Frage?") -> Dict[str, Any]:
+    return {
+        "id": question_id, "type": "single", "topic": "Recht", "question": {"de": text},
+        "options": {"de": ["Ja", "Nein"]}, "correctAnswer": [0], "explanation": {"de": "Weil."},
+    }
+
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    # Elements, strings and escapes cut at every possible read boundary
+    monkeypatch.setattr(importer, "READ_SIZE", 7)
+
+
+def test_json_array_across_read_boundaries(small_reads):
+    records = [question("1", 'Mit "Zitat", [Klammern] und {Feldern}'), question("2", "Umlaute: äöü ß €"), 3, None]
+    text = json.dumps(records, ensure_ascii=False, indent=2)
+    assert [value for _, value in iter_json_array(io.StringIO(text))] == records
+    assert [row for row, _ in iter_json_array(io.StringIO(text))] == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ ]  ", "[\n]"])
+def test_empty_json_array(text):
+    assert list(iter_json_array(io.StringIO(text))) == []
+
+
+@pytest.mark.parametrize("text, message", [
+    ('{"id": "1"}', "top-level array"),
+    ('[{"id": "1"}, ', "Unterminated JSON array"),
+    ('[{"id": "1"}, {"id": ]', "record 2"),
+])
+def test_malformed_json_array(text, message):
+    with pytest.raises(ValueError, match=message):
+        list(iter_json_array(io.StringIO(text)))
+
+
+def test_malformed_element_stops_at_that_record(small_reads):
+    # The bad element is reported without reading the rest of the file
+    text = json.dumps([question("1"), question("2")])[:-1] + ', {"id": oops}' + ", " + json.dumps(question("3")) * 1000 + "]"
+    stream = io.StringIO(text)
+    records = iter_json_array(stream)
+    assert [row for row, _ in (next(records), next(records))] == [1, 2]
+    with pytest.raises(ValueError, match="record 3"):
+        next(records)
+    assert stream.tell() < len(text) // 10
+
+
+def test_import_stream_writes_rows_read_before_an_abort():
+    text = "[" + json.dumps(question("1")) + ", " + json.dumps(question("2")) + ", {broken"
+    written = []
+    report = import_stream(iter_json_array(io.StringIO(text)), Question, written.extend, chunk_size=1)
+    assert [q["id"] for q in written] == ["1", "2"]
+    assert report["imported"] == 2 and report["importedThroughRow"] == 2
+    assert "record 3" in report["aborted"]
+
+
+def test_import_stream_collects_row_errors():
+    records = [(1, question("1")), (2, {**question("2"), "correctAnswer": [5]}), (3, "text"), (4, RowError("bad row"))]
+    written = []
+    report = import_stream(records, Question, written.extend)
+    assert [q["id"] for q in written] == ["1"]
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+    assert report["failed"] == 3
+
+
+def test_csv_to_question_maps_columns():
+    row = {
+        "id": "42", "type": "multiple", "topic": "Recht", "difficulty": "", "tags": "a; b;",
+        "correctAnswer": "0;2", "image": "", "question_de": "Welche?", "question_en": "Which?",
+        "options_de": "A|B|C", "options_en": "", "explanation_de": "Darum.",
+    }
+    assert csv_to_question(row) == {
+        "id": "42", "type": "multiple", "topic": "Recht", "difficulty": "medium", "tags": ["a", "b"],
+        "correctAnswer": [0, 2], "image": None, "question": {"de": "Welche?", "en": "Which?"},
+        "options": {"de": ["A", "B", "C"]}, "explanation": {"de": "Darum."},
+    }
+
+
+def test_csv_rows_are_numbered_like_a_spreadsheet():
+    text = "id,topic,correctAnswer,question_de,options_de,explanation_de\n1,Recht,0,F?,A|B,E\n2,Recht,x,F?,A|B,E\n"
+    records = list(iter_csv(io.StringIO(text, newline="")))
+    assert records[0][0] == 2 and records[0][1]["options"] == {"de": ["A", "B"]}
+    assert records[1][0] == 3 and isinstance(records[1][1], RowError)
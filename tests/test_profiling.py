@@ -0,0 +1,27 @@
+import asyncio
+import threading
+import time
+
+from profiling import StackSampler
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_idle_loop_is_counted_not_recorded_and_workers_are_sampled():
+    async def main():
+        sampler = StackSampler(threading.get_ident(), 0.005)
+        sampler.start()
+        await asyncio.sleep(0.1)
+        await asyncio.to_thread(busy, 0.1)
+        sampler.stop()
+        return sampler
+
+    sampler = asyncio.run(main())
+    assert sampler.idle_samples > 0
+    assert not any(stack.rsplit(";", 1)[-1].startswith("select (selectors.py:") for stack in sampler.stacks)
+    worker_stacks = [stack for stack in sampler.stacks if stack.startswith("asyncio_")]
+    assert sampler.worker_samples > 0 and any("busy (test_profiling.py" in stack for stack in worker_stacks)
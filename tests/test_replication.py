@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from replication import OutboxReplicator, outbox_entry  # noqa: E402
+
+
+class MemoryFirestore:
+    """In-memory stand-in for the Firestore client: documents by path, batched commits."""
+
+    def __init__(self):
+        self.documents = {}
+        self.commits = []
+        self.fail_commits = 0
+
+    def document(self, path):
+        return path
+
+    def batch(self):
+        return MemoryBatch(self)
+
+
+class MemoryBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, path, data, merge=False):
+        self.writes.append(("set", path, dict(data), merge))
+
+    def delete(self, path):
+        self.writes.append(("delete", path, None, False))
+
+    def commit(self, timeout=None):
+        if self.client.fail_commits:
+            self.client.fail_commits -= 1
+            raise RuntimeError("unavailable")
+        for op, path, data, merge in self.writes:
+            if op == "delete":
+                self.client.documents.pop(path, None)
+            elif merge:
+                self.client.documents[path] = {**self.client.documents.get(path, {}), **data}
+            else:
+                self.client.documents[path] = data
+        self.client.commits.append(self.writes)
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+@pytest.fixture
+def firestore():
+    return MemoryFirestore()
+
+
+def replicator(db, firestore, **kwargs):
+    instance = OutboxReplicator(db.outbox, lambda: firestore, versions=db.versions, leases=db.leases, **kwargs)
+    instance.ensure_indexes()
+    return instance
+
+
+def retry_now(db):
+    db.outbox.update_many({}, {"$set": {"nextAttemptAt": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_entries_are_applied_in_order(db, firestore):
+    worker = replicator(db, firestore)
+    worker.enqueue([
+        outbox_entry("questions/1", {"a": 1}),
+        outbox_entry("questions/1", {"b": 2}, op="merge"),
+        outbox_entry("questions/2", {"c": 3}),
+        outbox_entry("questions/2", op="delete"),
+    ])
+    assert worker.drain_once() == 4
+    assert firestore.documents == {"questions/1": {"a": 1, "b": 2}}
+    assert db.outbox.count_documents({}) == 0
+
+
+def test_failed_batch_is_retried_and_blocks_newer_entries(db, firestore):
+    worker = replicator(db, firestore)
+    worker.enqueue([outbox_entry("user_progress/u", {"step": 1})])
+    firestore.fail_commits = 1
+    assert worker.drain_once() == 0
+    # A newer entry for the same document waits for the one in backoff
+    worker.enqueue([outbox_entry("user_progress/u", {"step": 2}, op="merge")])
+    assert worker.drain_once() == 0
+    assert firestore.documents == {}
+    retry_now(db)
+    assert worker.drain_once() == 2
+    assert firestore.documents == {"user_progress/u": {"step": 2}}
+
+
+def test_older_versions_never_overwrite_newer_ones(db, firestore):
+    worker = replicator(db, firestore)
+    worker.enqueue([outbox_entry("user_progress/u", {"v": 6}, version=6, key="user_progress/u@6")])
+    worker.drain_once()
+    # Enqueued late (e.g. a retried job): already superseded
+    worker.enqueue([
+        outbox_entry("user_progress/u", {"v": 5}, version=5, key="user_progress/u@5"),
+        outbox_entry("user_progress/u", {"v": 6}, version=6, key="user_progress/u@6"),
+    ])
+    worker.drain_once()
+    assert firestore.documents == {"user_progress/u": {"v": 6}}
+    # Only the newest version of a batch is written
+    worker.enqueue([outbox_entry("user_progress/u", {"v": v}, version=v, key=f"user_progress/u@{v}") for v in (8, 7)])
+    worker.drain_once()
+    assert firestore.documents == {"user_progress/u": {"v": 8}}
+    assert [len(writes) for writes in firestore.commits] == [1, 0, 1]
+
+
+def test_keyed_entries_are_enqueued_once(db, firestore):
+    worker = replicator(db, firestore)
+    entry = outbox_entry("user_progress/u/answers/a1", {"x": 1}, key="user_progress/u/answers/a1")
+    worker.enqueue([entry])
+    worker.enqueue([dict(entry)])
+    assert db.outbox.count_documents({}) == 1
+
+
+def test_only_the_lease_holder_drains(db, firestore):
+    first, second = replicator(db, firestore), replicator(db, firestore)
+    first.enqueue([outbox_entry("questions/1", {"a": 1})])
+    assert first.drain_once() == 1
+    second.enqueue([outbox_entry("questions/1", {"a": 2})])
+    assert second.drain_once() == 0
+    assert not second.leader
+    assert first.drain_once() == 1
+    assert firestore.documents == {"questions/1": {"a": 2}}
+
+
+def test_full_backlog_drops_new_entries(db):
+    worker = replicator(db, MemoryFirestore(), max_backlog=2)
+    # Firestore unavailable: nothing drains
+    worker.firestore_factory = lambda: None
+    worker.enqueue([outbox_entry(f"questions/{i}", {}) for i in range(2)])
+    worker.drain_once()
+    worker.enqueue([outbox_entry("questions/3", {})])
+    assert db.outbox.count_documents({}) == 2
+    assert worker.snapshot()["dropped"] == 1